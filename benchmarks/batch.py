@@ -0,0 +1,99 @@
+"""Throughput of N single POST /order calls against one POST /order/batch of N.
+
+Usage: python -m benchmarks.batch [--size 100] [--repeat 5]
+
+Runs the app in-process over httpx's ASGI transport, so every request goes
+through routing, auth and the sequencer, but not a socket. Needs the database
+from .env with migrations applied; the scratch user and instruments it creates
+are deleted afterwards.
+"""
+import argparse
+import asyncio
+import time
+from uuid import uuid4
+
+import httpx
+from sqlalchemy import delete
+
+from src.app import app
+from src.config import settings
+from src.database import session_factory
+from src.balances.service import deposit
+from src.instruments.models import Instrument
+from src.instruments.registry import registry
+from src.instruments.schemas import CreateInstrument
+from src.instruments.service import create_instrument
+from src.orders.engine import engine
+from src.users.models import User
+from src.users.schemas import UserCreate
+from src.users.service import create_user
+
+
+def quotes(ticker: str, size: int) -> list[dict]:
+    # a ladder that never crosses, so every order rests and the book only grows
+    return [
+        {"direction": "BUY", "ticker": ticker, "qty": 1, "price": 1000 - n // 2} if n % 2 == 0 else
+        {"direction": "SELL", "ticker": ticker, "qty": 1, "price": 1001 + n // 2}
+        for n in range(size)
+    ]
+
+
+async def seed() -> tuple[str, str, str]:
+    suffix = uuid4().hex[:8].upper()
+    ticker, settings.QUOTE_TICKER = "BENCH" + suffix, "BENCHQ" + suffix
+    for name in (ticker, settings.QUOTE_TICKER):
+        await create_instrument(CreateInstrument(name=name, ticker=name))
+    user = await create_user(UserCreate(name="bench-" + suffix))
+    await deposit(user.id, registry.get_id(ticker), 10 ** 6)
+    await deposit(user.id, registry.get_id(settings.QUOTE_TICKER), 10 ** 9)
+    return user.id, user.api_key, ticker
+
+
+async def cleanup(user_id: str, ticker: str):
+    ids = [registry.remove(name) for name in (ticker, settings.QUOTE_TICKER)]
+    for instrument_id in ids:
+        engine.reset(instrument_id)
+    async with session_factory() as session:
+        await session.execute(delete(Instrument).where(Instrument.id.in_(ids)))
+        await session.execute(delete(User).where(User.id == user_id))
+        await session.commit()
+
+
+async def singles(client: httpx.AsyncClient, headers: dict, body: list[dict]) -> float:
+    start = time.perf_counter()
+    for order in body:
+        r = await client.post("/order", json=order, headers=headers)
+        r.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def batch(client: httpx.AsyncClient, headers: dict, body: list[dict]) -> float:
+    start = time.perf_counter()
+    r = await client.post("/order/batch", json=body, headers=headers)
+    r.raise_for_status()
+    assert all(item["success"] for item in r.json())
+    return time.perf_counter() - start
+
+
+async def main(size: int, repeat: int):
+    async with app.router.lifespan_context(app):
+        user_id, api_key, ticker = await seed()
+        headers = {"Authorization": "TOKEN " + api_key}
+        body = quotes(ticker, size)
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench/api/v1") as client:
+                print(f"{'mode':>8} {'orders':>7} {'best ms':>9} {'mean ms':>9} {'orders/s':>9}")
+                for mode, run in (("single", singles), ("batch", batch)):
+                    times = [await run(client, headers, body) for _ in range(repeat)]
+                    mean = sum(times) / len(times)
+                    print(f"{mode:>8} {size:>7} {min(times) * 1000:>9.2f} {mean * 1000:>9.2f} {size / mean:>9.0f}")
+        finally:
+            await cleanup(user_id, ticker)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.size, args.repeat))
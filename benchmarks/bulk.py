@@ -0,0 +1,113 @@
+"""Wall time of POST /admin/balance/bulk for a large CSV or NDJSON upload.
+
+Usage: python -m benchmarks.bulk [--rows 1000000] [--users 250000] [--ndjson]
+
+Seeds scratch users and BULK* instruments straight into the database from
+.env, then streams rows of (user_id, ticker, amount) spread over them through
+the ASGI app in 1 MB chunks. Every 1000th row is deliberately broken so the
+rejection path is exercised too. Scratch rows are deleted afterwards.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+from sqlalchemy import text
+
+from src.app import app
+from src.database import session_factory
+from src.instruments.registry import registry
+from src.instruments.schemas import CreateInstrument
+from src.instruments.service import create_instrument
+from src.orders.engine import engine
+from src.users.schemas import UserCreate
+from src.users.service import create_user
+
+
+PREFIX = "bulkbench-"
+TICKERS = ["BULKA", "BULKB", "BULKC", "BULKD"]
+CHUNK = 1 << 20
+
+
+async def seed(users: int) -> tuple[str, list[str]]:
+    admin = await create_user(UserCreate(name=PREFIX + "admin"))
+    async with session_factory() as session:
+        await session.execute(text("UPDATE users SET role = 'ADMIN' WHERE id = :id"), {"id": admin.id})
+        result = await session.execute(text(
+            """
+            INSERT INTO users (id, name, role, api_key_hash, encrypted_api_key, is_active)
+            SELECT gen_random_uuid(), :prefix || n, 'USER', md5(:prefix || n), md5(:prefix || n || 'e'), true
+            FROM generate_series(1, :users) n
+            RETURNING id
+            """
+        ), {"prefix": PREFIX, "users": users})
+        ids = [str(row.id) for row in result]
+        await session.commit()
+    for ticker in TICKERS:
+        await create_instrument(CreateInstrument(name=ticker, ticker=ticker))
+    return admin.api_key, ids
+
+
+async def cleanup():
+    for ticker in TICKERS:
+        instrument_id = registry.remove(ticker)
+        if instrument_id is not None:
+            engine.reset(instrument_id)
+    async with session_factory() as session:
+        await session.execute(text("DELETE FROM instruments WHERE ticker = ANY(:tickers)"), {"tickers": TICKERS})
+        await session.execute(text("DELETE FROM users WHERE name LIKE :prefix || '%'"), {"prefix": PREFIX})
+        await session.commit()
+
+
+def rows(ids: list[str], count: int, ndjson: bool):
+    for n in range(count):
+        user_id, ticker, amount = ids[n % len(ids)], TICKERS[n // len(ids) % len(TICKERS)], 1 + n % 1000
+        if n % 1000 == 999:
+            ticker = "NOPE"
+        if ndjson:
+            yield json.dumps({"user_id": user_id, "ticker": ticker, "amount": amount}) + "\n"
+        else:
+            yield f"{user_id},{ticker},{amount}\n"
+
+
+async def body(ids: list[str], count: int, ndjson: bool):
+    buffer = []
+    size = 0
+    for row in rows(ids, count, ndjson):
+        buffer.append(row)
+        size += len(row)
+        if size >= CHUNK:
+            yield "".join(buffer).encode()
+            buffer, size = [], 0
+    yield "".join(buffer).encode()
+
+
+async def main(count: int, users: int, ndjson: bool):
+    async with app.router.lifespan_context(app):
+        await cleanup()
+        api_key, ids = await seed(users)
+        headers = {
+            "Authorization": "TOKEN " + api_key,
+            "Content-Type": "application/x-ndjson" if ndjson else "text/csv"
+        }
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench/api/v1", timeout=None) as client:
+                start = time.perf_counter()
+                r = await client.post("/admin/balance/bulk", content=body(ids, count, ndjson), headers=headers)
+                elapsed = time.perf_counter() - start
+            r.raise_for_status()
+            result = r.json()
+            print(f"{count} rows ({'ndjson' if ndjson else 'csv'}) in {elapsed:.2f}s: "
+                  f"{result['accepted']} accepted, {result['rejected']} rejected, {count / elapsed:.0f} rows/s")
+        finally:
+            await cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=250_000)
+    parser.add_argument("--ndjson", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.users, args.ndjson))
@@ -0,0 +1,68 @@
+"""Latency of cancelling N resting orders one by one against one mass cancel.
+
+Usage: python -m benchmarks.cancel [--orders 1000] [--repeat 3]
+
+Runs the app in-process over httpx's ASGI transport like benchmarks/batch.py.
+Before every run the scratch user's book is refilled with N non-crossing
+quotes through POST /order/batch. Needs the database from .env with migrations
+applied; scratch rows are deleted afterwards.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from src.app import app
+from benchmarks.batch import cleanup, quotes, seed
+
+
+async def fill(client: httpx.AsyncClient, headers: dict, ticker: str, orders: int) -> list[str]:
+    ids = []
+    body = quotes(ticker, orders)
+    for i in range(0, orders, 1000):
+        r = await client.post("/order/batch", json=body[i:i + 1000], headers=headers)
+        r.raise_for_status()
+        ids += [item["order_id"] for item in r.json()]
+    return ids
+
+
+async def singles(client: httpx.AsyncClient, headers: dict, ticker: str, ids: list[str]) -> float:
+    start = time.perf_counter()
+    for id in ids:
+        r = await client.delete(f"/order/{id}", headers=headers)
+        r.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def mass(client: httpx.AsyncClient, headers: dict, ticker: str, ids: list[str]) -> float:
+    start = time.perf_counter()
+    r = await client.delete("/order", params={"ticker": ticker}, headers=headers)
+    r.raise_for_status()
+    assert len(r.json()["order_ids"]) == len(ids)
+    return time.perf_counter() - start
+
+
+async def main(orders: int, repeat: int):
+    async with app.router.lifespan_context(app):
+        user_id, api_key, ticker = await seed()
+        headers = {"Authorization": "TOKEN " + api_key}
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench/api/v1") as client:
+                print(f"{'mode':>8} {'orders':>7} {'best ms':>9} {'mean ms':>9}")
+                for mode, run in (("single", singles), ("mass", mass)):
+                    times = []
+                    for _ in range(repeat):
+                        ids = await fill(client, headers, ticker, orders)
+                        times.append(await run(client, headers, ticker, ids))
+                    print(f"{mode:>8} {orders:>7} {min(times) * 1000:>9.2f} {sum(times) / len(times) * 1000:>9.2f}")
+        finally:
+            await cleanup(user_id, ticker)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.orders, args.repeat))
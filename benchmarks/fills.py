@@ -0,0 +1,131 @@
+"""Round trips and wall time of persisting a sweep of N resting orders.
+
+Usage: python -m benchmarks.fills [--levels 1 10 100 1000] [--repeat 5]
+
+Needs the database from .env with migrations applied. Each run seeds its own
+user and instrument and deletes them afterwards.
+"""
+import argparse
+import asyncio
+import time
+from uuid import uuid4
+
+from sqlalchemy import delete, event, insert, update
+
+from src.config import settings
+from src.database import engine as db_engine, session_factory
+from src.balances.models import Balance
+from src.balances.service import load_balances
+from src.instruments.models import Instrument
+from src.instruments.registry import registry
+from src.orders import service
+from src.orders.engine import engine
+from src.orders.models import Direction, Order, Status
+from src.orders.schemas import MarketOrderBody
+from src.transactions.models import Transaction
+from src.users.models import Role, User
+
+
+statements = 0
+
+
+def count_statement(*args):
+    global statements
+    statements += 1
+
+
+async def persist_per_fill(session, instrument_id, fills, timestamp):
+    seqs = []
+    for fill in fills:
+        await session.execute(
+            update(Order).where(Order.id == fill.maker.id).values(
+                filled=fill.maker.filled,
+                status=Status.EXECUTED if not fill.maker.remaining else Status.PARTIALLY_EXECUTED
+            )
+        )
+        seqs.append(await session.scalar(
+            insert(Transaction).values(
+                id=uuid4(),
+                instrument_id=instrument_id,
+                amount=fill.qty,
+                price=fill.price,
+                timestamp=timestamp
+            ).returning(Transaction.seq)
+        ))
+    return seqs
+
+
+async def seed(levels: int) -> tuple[str, str, str]:
+    user_id, instrument_id, ticker = str(uuid4()), str(uuid4()), "BENCH" + uuid4().hex[:8].upper()
+    quote_id, settings.QUOTE_TICKER = str(uuid4()), ticker + "Q"
+    async with session_factory() as session:
+        await session.execute(insert(User).values(
+            id=user_id, name="bench", role=Role.USER, api_key_hash=uuid4().hex, encrypted_api_key=uuid4().hex
+        ))
+        await session.execute(insert(Instrument).values(id=instrument_id, name=ticker, ticker=ticker))
+        await session.execute(insert(Instrument).values(id=quote_id, name=settings.QUOTE_TICKER, ticker=settings.QUOTE_TICKER))
+        await session.execute(insert(Balance), [
+            {"id": uuid4(), "user_id": user_id, "instrument_id": instrument_id, "amount": levels},
+            {"id": uuid4(), "user_id": user_id, "instrument_id": quote_id, "amount": levels * (levels + 1) // 2}
+        ])
+        await session.execute(insert(Order), [
+            {
+                "id": uuid4(),
+                "user_id": user_id,
+                "instrument_id": instrument_id,
+                "direction": Direction.SELL,
+                "price": price,
+                "qty": 1,
+                "filled": 0
+            } for price in range(1, levels + 1)
+        ])
+        await session.commit()
+    registry.add(instrument_id, ticker, ticker)
+    registry.add(quote_id, settings.QUOTE_TICKER, settings.QUOTE_TICKER)
+    await service.load_books(instrument_id)
+    await load_balances()
+    return user_id, instrument_id, ticker
+
+
+async def cleanup(user_id: str, instrument_id: str):
+    engine.reset(instrument_id)
+    registry.remove(registry.get_ticker(instrument_id))
+    quote_id = registry.remove(settings.QUOTE_TICKER)
+    async with session_factory() as session:
+        await session.execute(delete(Instrument).where(Instrument.id.in_([instrument_id, quote_id])))
+        await session.execute(delete(User).where(User.id == user_id))
+        await session.commit()
+
+
+async def sweep(levels: int, persist) -> tuple[int, float]:
+    global statements
+    user_id, instrument_id, ticker = await seed(levels)
+    service.persist_fills = persist
+    try:
+        statements = 0
+        start = time.perf_counter()
+        await service.create_order(user_id, MarketOrderBody(direction=Direction.BUY, qty=levels, ticker=ticker))
+        return statements, time.perf_counter() - start
+    finally:
+        await cleanup(user_id, instrument_id)
+
+
+async def main(levels: list[int], repeat: int):
+    batched = service.persist_fills
+    event.listen(db_engine.sync_engine, "before_cursor_execute", count_statement)
+    print(f"{'levels':>8} {'mode':>9} {'statements':>11} {'best ms':>9} {'mean ms':>9}")
+    for n in levels:
+        for mode, persist in (("per-fill", persist_per_fill), ("batched", batched)):
+            runs = [await sweep(n, persist) for _ in range(repeat)]
+            times = [t for _, t in runs]
+            print(f"{n:>8} {mode:>9} {runs[0][0]:>11} {min(times) * 1000:>9.2f} {sum(times) / len(times) * 1000:>9.2f}")
+    service.persist_fills = batched
+    await db_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.levels, args.repeat))
@@ -0,0 +1,254 @@
+"""End-to-end load test: a weighted mix of API calls from many users and tickers.
+
+Usage: python -m benchmarks.load [--duration 30] [--concurrency 32] [--users 50]
+                                 [--tickers 5] [--mix limit=40,market=10,...]
+                                 [--url http://localhost:8000 --admin-key KEY]
+                                 [--out load.json]
+
+By default the app runs in-process over httpx's ASGI transport against the
+database from .env; point DATABASE_URL at a disposable Postgres, since the run
+registers users, creates LOAD* instruments and places orders. With --url the
+same flow is sent over HTTP to a running server, which needs the key of an
+existing admin.
+
+Setup registers --users users, creates the tickers (and the quote instrument if
+missing) and funds every account. Then --concurrency workers pick calls by the
+--mix weights until --duration runs out. Throughput and p50/p95/p99 latency per
+route are printed and written as JSON to --out, along with the settings and the
+git revision, so runs can be compared across versions. Scratch users and
+instruments are deleted at the end.
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import httpx
+
+
+MIX = "register=2,deposit=3,limit=40,market=10,cancel=15,orderbook=15,history=10,balance=5"
+PREFIX = "load-"
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    async def call(self, route: str, request) -> httpx.Response:
+        start = time.perf_counter()
+        response = await request
+        self.latencies[route].append(time.perf_counter() - start)
+        self.statuses[route][response.status_code] += 1
+        return response
+
+    def report(self, elapsed: float) -> dict:
+        routes = {}
+        for route, latencies in sorted(self.latencies.items()):
+            latencies.sort()
+            routes[route] = {
+                "requests": len(latencies),
+                "rps": len(latencies) / elapsed,
+                "errors": sum(n for status, n in self.statuses[route].items() if status >= 400),
+                "statuses": dict(self.statuses[route]),
+                "mean_ms": sum(latencies) / len(latencies) * 1000,
+                "p50_ms": percentile(latencies, 50),
+                "p95_ms": percentile(latencies, 95),
+                "p99_ms": percentile(latencies, 99),
+                "max_ms": latencies[-1] * 1000
+            }
+        total = sum(r["requests"] for r in routes.values())
+        return {"elapsed_s": elapsed, "requests": total, "rps": total / elapsed, "routes": routes}
+
+
+def percentile(ordered: list[float], p: int) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000
+
+
+class Load:
+    def __init__(self, client: httpx.AsyncClient, admin: dict, tickers: list[str], quote: str, rng: random.Random):
+        self.client = client
+        self.admin = admin
+        self.tickers = tickers
+        self.quote = quote
+        self.rng = rng
+        self.users: list[tuple[str, dict]] = []
+        self.orders: dict[str, list[str]] = defaultdict(list)
+        self.recorder = Recorder()
+
+    async def register(self):
+        r = await self.recorder.call("POST /public/register", self.client.post(
+            "/public/register", json={"name": PREFIX + uuid4().hex[:12]}
+        ))
+        if r.status_code == 200:
+            user = r.json()
+            headers = {"Authorization": "TOKEN " + user["api_key"]}
+            for ticker in self.tickers + [self.quote]:
+                await self.deposit(user["id"], ticker)
+            self.users.append((user["id"], headers))
+
+    async def deposit(self, user_id: str | None = None, ticker: str | None = None):
+        user_id = user_id or self.rng.choice(self.users)[0]
+        ticker = ticker or self.rng.choice(self.tickers + [self.quote])
+        amount = 10_000_000 if ticker == self.quote else 100_000
+        await self.recorder.call("POST /admin/balance/deposit", self.client.post(
+            "/admin/balance/deposit", json={"user_id": user_id, "ticker": ticker, "amount": amount}, headers=self.admin
+        ))
+
+    async def limit(self):
+        user_id, headers = self.rng.choice(self.users)
+        direction = self.rng.choice(["BUY", "SELL"])
+        # prices cluster around 100, skewed to the passive side so the books build depth
+        offset = int(self.rng.expovariate(0.3))
+        price = 100 - offset if direction == "BUY" else 100 + offset
+        body = {"direction": direction, "ticker": self.rng.choice(self.tickers), "qty": self.rng.randint(1, 20), "price": max(1, price)}
+        r = await self.recorder.call("POST /order (limit)", self.client.post("/order", json=body, headers=headers))
+        if r.status_code == 200:
+            self.orders[user_id].append(r.json()["order_id"])
+
+    async def market(self):
+        _, headers = self.rng.choice(self.users)
+        body = {"direction": self.rng.choice(["BUY", "SELL"]), "ticker": self.rng.choice(self.tickers), "qty": self.rng.randint(1, 10)}
+        await self.recorder.call("POST /order (market)", self.client.post("/order", json=body, headers=headers))
+
+    async def cancel(self):
+        user_id, headers = self.rng.choice(self.users)
+        if not self.orders[user_id]:
+            return await self.limit()
+        order_id = self.orders[user_id].pop(self.rng.randrange(len(self.orders[user_id])))
+        await self.recorder.call("DELETE /order/{id}", self.client.delete(f"/order/{order_id}", headers=headers))
+
+    async def orderbook(self):
+        ticker = self.rng.choice(self.tickers)
+        await self.recorder.call("GET /public/orderbook/{ticker}", self.client.get(f"/public/orderbook/{ticker}"))
+
+    async def history(self):
+        ticker = self.rng.choice(self.tickers)
+        await self.recorder.call("GET /public/transactions/{ticker}", self.client.get(
+            f"/public/transactions/{ticker}", params={"limit": self.rng.choice([10, 50, 100])}
+        ))
+
+    async def balance(self):
+        _, headers = self.rng.choice(self.users)
+        await self.recorder.call("GET /balance", self.client.get("/balance", headers=headers))
+
+    async def worker(self, mix: dict[str, int], deadline: float):
+        calls = [getattr(self, name) for name in mix]
+        weights = list(mix.values())
+        while time.perf_counter() < deadline:
+            await self.rng.choices(calls, weights)[0]()
+
+
+async def setup(client: httpx.AsyncClient, admin: dict, tickers: list[str], quote: str):
+    for ticker in tickers + [quote]:
+        r = await client.post("/admin/instrument", json={"name": ticker, "ticker": ticker}, headers=admin)
+        if r.status_code != 200 and ticker != quote:
+            r.raise_for_status()
+
+
+async def teardown(client: httpx.AsyncClient, admin: dict, load: Load):
+    for ticker in load.tickers:
+        await client.delete(f"/admin/instrument/{ticker}", headers=admin)
+    for user_id, _ in load.users:
+        await client.delete(f"/admin/user/{user_id}", headers=admin)
+
+
+async def in_process_admin() -> tuple[dict, str]:
+    from sqlalchemy import update
+    from src.database import session_factory
+    from src.users.models import User
+    from src.users.schemas import Role, UserCreate
+    from src.users.service import create_user
+
+    admin = await create_user(UserCreate(name=PREFIX + "admin-" + uuid4().hex[:8]))
+    async with session_factory() as session:
+        await session.execute(update(User).where(User.id == admin.id).values(role=Role.ADMIN))
+        await session.commit()
+    return {"Authorization": "TOKEN " + admin.api_key}, admin.id
+
+
+async def run(client: httpx.AsyncClient, admin: dict, args, mix: dict[str, int]) -> dict:
+    rng = random.Random(args.seed)
+    tickers = [f"LOAD{n}" for n in range(args.tickers)]
+    load = Load(client, admin, tickers, args.quote, rng)
+    await setup(client, admin, tickers, args.quote)
+    try:
+        for _ in range(args.users):
+            await load.register()
+        load.recorder = Recorder()
+        start = time.perf_counter()
+        await asyncio.gather(*(load.worker(mix, start + args.duration) for _ in range(args.concurrency)))
+        return load.recorder.report(time.perf_counter() - start)
+    finally:
+        await teardown(client, admin, load)
+
+
+def revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args):
+    mix = {name: int(weight) for name, weight in (item.split("=") for item in args.mix.split(","))}
+    if args.url:
+        if not args.admin_key:
+            raise SystemExit("--url needs --admin-key")
+        admin = {"Authorization": "TOKEN " + args.admin_key}
+        async with httpx.AsyncClient(base_url=args.url.rstrip("/") + "/api/v1", timeout=30) as client:
+            result = await run(client, admin, args, mix)
+    else:
+        from src.app import app
+        from src.config import settings
+
+        args.quote = settings.QUOTE_TICKER
+        async with app.router.lifespan_context(app):
+            admin, admin_id = await in_process_admin()
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://load/api/v1", timeout=30) as client:
+                try:
+                    result = await run(client, admin, args, mix)
+                finally:
+                    await client.delete(f"/admin/user/{admin_id}", headers=admin)
+
+    result["meta"] = {
+        "started": datetime.now(timezone.utc).isoformat(),
+        "revision": revision(),
+        "mode": "http" if args.url else "asgi",
+        "url": args.url,
+        "duration": args.duration,
+        "concurrency": args.concurrency,
+        "users": args.users,
+        "tickers": args.tickers,
+        "mix": mix,
+        "seed": args.seed
+    }
+    print(f"{'route':<36} {'requests':>9} {'rps':>8} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for route, stats in result["routes"].items():
+        print(f"{route:<36} {stats['requests']:>9} {stats['rps']:>8.1f} {stats['errors']:>7} "
+              f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}")
+    print(f"{'total':<36} {result['requests']:>9} {result['rps']:>8.1f}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--tickers", type=int, default=5)
+    parser.add_argument("--mix", default=MIX)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url")
+    parser.add_argument("--admin-key")
+    parser.add_argument("--quote", default="RUB")
+    parser.add_argument("--out", default="load.json")
+    asyncio.run(main(parser.parse_args()))
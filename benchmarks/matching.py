@@ -0,0 +1,213 @@
+"""Matching throughput against book depth, order flow shape and cancel rate.
+
+Usage: python -m benchmarks.matching [--depths 10 1000 100000 1000000]
+                                     [--flows poisson skewed cancels] [--orders 100000]
+
+No HTTP and no database: every order goes through match_order from
+src/orders/service.py (balance check, matching, settlement into the ledger)
+and stops where persist_matches would write it; cancels take the in-memory
+part of cancel_order. Each run prefills one book with --depth resting orders
+spread over levels around a mid price of 10000, then replays --orders events
+from one of the flows:
+
+- poisson: limit, market and cancel arrivals as independent Poisson processes
+  (4.5, 0.5 and 2 per tick), Poisson sizes, limit prices normal around the mid
+- skewed: prices with a heavy tail on one side, lognormal sizes, 20% market
+- cancels: 80% of events cancel a random resting order, the rest are limits
+
+Reported are orders and fills per second and, from a second pass of the same
+events under tracemalloc, the peak traced memory and the memory blocks still
+held per order afterwards (how much each order grows the book).
+"""
+import argparse
+import gc
+import math
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+# the service modules read settings on import; nothing here connects anywhere
+for name, value in (("DATABASE_URL", "localhost/bench"), ("HASH_KEY", "bench"), ("ENCRYPTION_KEY", "bench")):
+    os.environ.setdefault(name, value)
+
+from src.balances.ledger import ledger, reservation
+from src.orders.engine import engine, RestingOrder
+from src.orders.models import Direction
+from src.orders.schemas import LimitOrderBody, MarketOrderBody
+from src.orders.service import match_order
+
+
+INSTRUMENT = "bench-instrument"
+QUOTE = "bench-quote"
+TICKER = "BENCH"
+MID = 10_000
+USERS = [f"bench-user-{n}" for n in range(100)]
+
+
+def poisson(rng: random.Random, lam: float) -> int:
+    # Knuth's method; lam stays small
+    limit, k, p = math.exp(-lam), 0, 1.0
+    while p > limit:
+        k += 1
+        p *= rng.random()
+    return k - 1
+
+
+# mean arrivals per tick of each event kind in poisson_flow
+RATES = {"limit": 4.5, "market": 0.5, "cancel": 2.0}
+
+
+def poisson_flow(rng: random.Random, n: int):
+    # every tick draws how many events of each kind arrive and replays them in
+    # random order, so bursts of one kind happen as often as Poisson says
+    emitted = 0
+    while emitted < n:
+        tick = [kind for kind, rate in RATES.items() for _ in range(poisson(rng, rate))]
+        rng.shuffle(tick)
+        for kind in tick[:n - emitted]:
+            direction = rng.choice([Direction.BUY, Direction.SELL])
+            if kind == "cancel":
+                yield "cancel", None, None, None
+            elif kind == "market":
+                yield "market", direction, None, max(1, poisson(rng, 5))
+            else:
+                yield "limit", direction, max(1, int(rng.gauss(MID, 50))), max(1, poisson(rng, 5))
+            emitted += 1
+
+
+def skewed_flow(rng: random.Random, n: int):
+    for _ in range(n):
+        direction = Direction.BUY if rng.random() < 0.7 else Direction.SELL
+        qty = max(1, int(rng.lognormvariate(1.5, 1.0)))
+        if rng.random() < 0.2:
+            yield "market", direction, None, qty
+        else:
+            # mostly at or inside the touch, sometimes far away
+            offset = int(rng.paretovariate(1.5)) - 1
+            yield "limit", direction, (MID - offset if direction == Direction.BUY else MID + offset), qty
+
+
+def cancel_flow(rng: random.Random, n: int):
+    for _ in range(n):
+        if rng.random() < 0.8:
+            yield "cancel", None, None, None
+        else:
+            direction = rng.choice([Direction.BUY, Direction.SELL])
+            yield "limit", direction, MID - rng.randint(1, 100) if direction == Direction.BUY else MID + rng.randint(1, 100), rng.randint(1, 10)
+
+
+FLOWS = {"poisson": poisson_flow, "skewed": skewed_flow, "cancels": cancel_flow}
+
+
+def prefill(depth: int, rng: random.Random):
+    engine.reset()
+    ledger.clear()
+    for user in USERS:
+        ledger.amounts[user, INSTRUMENT] = 10 ** 15
+        ledger.amounts[user, QUOTE] = 10 ** 18
+    engine.book(INSTRUMENT, TICKER)
+    levels = max(1, min(depth // 2, 1000))
+    for n in range(depth):
+        direction = Direction.BUY if n % 2 else Direction.SELL
+        distance = 1 + n // 2 % levels
+        order = RestingOrder(
+            id=f"prefill-{n}",
+            user_id=rng.choice(USERS),
+            instrument_id=INSTRUMENT,
+            direction=direction,
+            price=MID - distance if direction == Direction.BUY else MID + distance,
+            qty=rng.randint(1, 10)
+        )
+        engine.rest(order)
+        key, qty = reservation(order, QUOTE)
+        ledger.reserved[key] += qty
+
+
+def events(flow: str, n: int, rng: random.Random) -> list:
+    built = []
+    for kind, direction, price, qty in FLOWS[flow](rng, n):
+        if kind == "limit":
+            built.append(LimitOrderBody(direction=direction, ticker=TICKER, qty=qty, price=price))
+        elif kind == "market":
+            built.append(MarketOrderBody(direction=direction, ticker=TICKER, qty=qty))
+        else:
+            built.append(None)
+    return built
+
+
+def replay(orders: list, rng: random.Random) -> tuple[int, int, int]:
+    book = engine.books[INSTRUMENT]
+    placed = fills = cancelled = 0
+    ids = list(engine.orders)
+    for order in orders:
+        if order is None:
+            while ids:
+                # swap-remove so picking a victim stays O(1) at a million resting orders
+                i = rng.randrange(len(ids))
+                ids[i], ids[-1] = ids[-1], ids[i]
+                resting = engine.orders.get(ids.pop())
+                if resting is not None:
+                    engine.cancel(resting.id)
+                    key, qty = reservation(resting, QUOTE)
+                    ledger.apply({}, {key: -qty})
+                    cancelled += 1
+                    break
+            continue
+        taker, taker_fills, _, freed = match_order(rng.choice(USERS), QUOTE, book, order, None)
+        # what persist_matches would apply after the commit
+        ledger.apply(*freed)
+        placed += 1
+        fills += len(taker_fills)
+        if taker.id in engine.orders:
+            ids.append(taker.id)
+    return placed, fills, cancelled
+
+
+def run(depth: int, flow: str, n: int, seed: int) -> dict:
+    orders = events(flow, n, random.Random(seed))
+
+    prefill(depth, random.Random(seed))
+    gc.collect()
+    start = time.perf_counter()
+    placed, fills, cancelled = replay(orders, random.Random(seed))
+    elapsed = time.perf_counter() - start
+
+    prefill(depth, random.Random(seed))
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    replay(orders, random.Random(seed))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    held = sys.getallocatedblocks() - blocks
+
+    return {
+        "orders/s": (placed + cancelled) / elapsed,
+        "fills/s": fills / elapsed,
+        "fills": fills,
+        "cancels": cancelled,
+        "peak KiB": peak / 1024,
+        "blocks/order": held / max(1, placed + cancelled),
+        "resting": len(engine.orders)
+    }
+
+
+def main(depths: list[int], flows: list[str], n: int, seed: int):
+    print(f"{'depth':>8} {'flow':>8} {'orders/s':>10} {'fills/s':>10} {'fills':>8} {'cancels':>8} {'peak KiB':>9} {'blocks/order':>13} {'resting':>8}")
+    for depth in depths:
+        for flow in flows:
+            r = run(depth, flow, n, seed)
+            print(f"{depth:>8} {flow:>8} {r['orders/s']:>10.0f} {r['fills/s']:>10.0f} {r['fills']:>8} {r['cancels']:>8} "
+                  f"{r['peak KiB']:>9.0f} {r['blocks/order']:>13.2f} {r['resting']:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--depths", type=int, nargs="+", default=[10, 1000, 100_000, 1_000_000])
+    parser.add_argument("--flows", nargs="+", choices=list(FLOWS), default=list(FLOWS))
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args.depths, args.flows, args.orders, args.seed)
@@ -0,0 +1,104 @@
+"""Cost of the /metrics instrumentation on the order path.
+
+Usage: python -m benchmarks.metrics [--rounds 5] [--duration 10] [--concurrency 16]
+
+Runs the in-process load test (benchmarks/load.py) with an order-only mix,
+alternating METRICS_ENABLED=false and true in fresh processes so each run
+builds the app with or without the middleware, the statement hooks and the
+service wrappers. Alternating rounds spreads drift of the machine and the
+database over both modes. Prints the median order throughput and mean latency
+of each mode and the overhead of the instrumented one; needs the same
+disposable database as benchmarks/load.py.
+
+On a shared or single-core box the A/B spread between rounds can exceed the
+instrumentation itself, so the hooks are also timed in isolation: one request
+through the middleware, one measured service call and three statements, the
+shape of a limit order. That cost times the measured order rate is the share
+of each second the instrumentation takes.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+MIX = "limit=3,market=1,cancel=1"
+ROUTES = ("POST /order (limit)", "POST /order (market)", "DELETE /order/{id}")
+
+
+def run(enabled: bool, args) -> tuple[float, float]:
+    with tempfile.NamedTemporaryFile(suffix=".json") as out:
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.load", "--mix", MIX, "--duration", str(args.duration),
+             "--concurrency", str(args.concurrency), "--out", out.name],
+            env={**os.environ, "METRICS_ENABLED": str(enabled).lower()},
+            check=True,
+            stdout=subprocess.DEVNULL
+        )
+        routes = json.load(open(out.name))["routes"]
+    requests = sum(routes[r]["requests"] for r in ROUTES if r in routes)
+    rps = sum(routes[r]["rps"] for r in ROUTES if r in routes)
+    mean = sum(routes[r]["mean_ms"] * routes[r]["requests"] for r in ROUTES if r in routes) / requests
+    return rps, mean
+
+
+def hook_cost(n: int = 100_000) -> float:
+    os.environ["METRICS_ENABLED"] = "true"
+    from src.metrics import MetricsMiddleware, measured, before_cursor_execute, after_cursor_execute
+
+    async def endpoint(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200})
+
+    async def send(message):
+        pass
+
+    async def service():
+        context = SimpleNamespace()
+        for _ in range(3):
+            before_cursor_execute(None, None, "INSERT INTO orders", None, context, False)
+            after_cursor_execute(None, None, "INSERT INTO orders", None, context, False)
+
+    middleware = MetricsMiddleware(endpoint)
+    wrapped = measured(service)
+    scope = {"type": "http", "method": "POST", "route": SimpleNamespace(path="/api/v1/order")}
+
+    async def time_calls(app, fn) -> float:
+        start = time.perf_counter()
+        for _ in range(n):
+            await app(scope, None, send)
+            await fn()
+        return time.perf_counter() - start
+
+    async def compare() -> float:
+        return (await time_calls(middleware, wrapped) - await time_calls(endpoint, service)) / n
+
+    return asyncio.run(compare())
+
+
+def main(args):
+    results = {False: [], True: []}
+    for n in range(args.rounds):
+        for enabled in (False, True) if n % 2 == 0 else (True, False):
+            rps, mean = run(enabled, args)
+            results[enabled].append((rps, mean))
+            print(f"round {n + 1} metrics={'on ' if enabled else 'off'} {rps:>8.1f} orders/s {mean:>7.2f} ms mean")
+    off_rps, off_ms = (statistics.median(x) for x in zip(*results[False]))
+    on_rps, on_ms = (statistics.median(x) for x in zip(*results[True]))
+    print(f"{'off':<4} {off_rps:>8.1f} orders/s {off_ms:>7.2f} ms")
+    print(f"{'on':<4} {on_rps:>8.1f} orders/s {on_ms:>7.2f} ms")
+    print(f"overhead: {(off_rps - on_rps) / off_rps * 100:+.1f}% throughput, {(on_ms - off_ms) / off_ms * 100:+.1f}% latency")
+    cost = hook_cost()
+    print(f"hooks: {cost * 1e6:.1f} us per order, {cost * off_rps * 100:.2f}% of each second at {off_rps:.0f} orders/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=16)
+    main(parser.parse_args())
@@ -0,0 +1,111 @@
+"""Rebuild the candles table from the transactions table.
+
+Usage: python -m scripts.backfill_candles [--ticker MEMCOIN] [--days 1]
+
+Walks every instrument's trade tape in windows of --days UTC days. Inside a
+window the 1s candles are aggregated from the raw trades in one statement and
+every coarser interval is rolled up from the previous one, so only the first
+step reads transactions. Windows are aligned to midnight, so no candle spans
+two windows and a window is recomputed in full and overwritten; the job can be
+re-run at any time. A trade committed while its window is being rebuilt can be
+overwritten by the older aggregate, so run it before the exchange starts
+trading or re-run it for the affected window afterwards.
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from src.database import engine as db_engine, session_factory
+from src.instruments.service import load_instruments
+from src.instruments.registry import registry
+from src.candles.schemas import PERIODS
+from src.candles.service import bucket
+
+
+UPSERT = """
+ON CONFLICT (instrument_id, period, start) DO UPDATE SET
+    open = excluded.open,
+    high = excluded.high,
+    low = excluded.low,
+    close = excluded.close,
+    volume = excluded.volume
+"""
+
+TRADES = """
+INSERT INTO candles (instrument_id, period, start, open, high, low, close, volume)
+SELECT
+    instrument_id,
+    CAST(:period AS integer),
+    date_bin(make_interval(secs => CAST(:period AS integer)), timestamp, TIMESTAMPTZ 'epoch') AS bucket,
+    (array_agg(price ORDER BY timestamp, seq))[1],
+    max(price),
+    min(price),
+    (array_agg(price ORDER BY timestamp DESC, seq DESC))[1],
+    sum(amount)
+FROM transactions
+WHERE instrument_id = :instrument_id AND timestamp >= :start AND timestamp < :end
+GROUP BY instrument_id, bucket
+""" + UPSERT
+
+ROLLUP = """
+INSERT INTO candles (instrument_id, period, start, open, high, low, close, volume)
+SELECT
+    instrument_id,
+    CAST(:period AS integer),
+    date_bin(make_interval(secs => CAST(:period AS integer)), start, TIMESTAMPTZ 'epoch') AS bucket,
+    (array_agg(open ORDER BY start))[1],
+    max(high),
+    min(low),
+    (array_agg(close ORDER BY start DESC))[1],
+    sum(volume)
+FROM candles
+WHERE instrument_id = :instrument_id AND period = :child AND start >= :start AND start < :end
+GROUP BY instrument_id, bucket
+""" + UPSERT
+
+
+async def backfill(instrument_id: str, days: int) -> int:
+    periods = sorted(PERIODS.values())
+    async with session_factory() as session:
+        first, last = (await session.execute(text(
+            "SELECT min(timestamp), max(timestamp) FROM transactions WHERE instrument_id = :instrument_id"
+        ), {"instrument_id": instrument_id})).one()
+    if first is None:
+        return 0
+    start = bucket(first, periods[-1])
+    windows = 0
+    while start <= last:
+        end = start + timedelta(days=days)
+        params = {"instrument_id": instrument_id, "start": start, "end": end}
+        async with session_factory() as session:
+            await session.execute(text(TRADES), {**params, "period": periods[0]})
+            for child, period in zip(periods, periods[1:]):
+                await session.execute(text(ROLLUP), {**params, "period": period, "child": child})
+            await session.commit()
+        start = end
+        windows += 1
+    return windows
+
+
+async def main(ticker: str | None, days: int):
+    await load_instruments()
+    tickers = [ticker] if ticker else sorted(instrument.ticker for instrument in registry.all())
+    for name in tickers:
+        instrument_id = registry.get_id(name)
+        if instrument_id is None:
+            print(f"{name}: no such instrument")
+            continue
+        started = datetime.now()
+        windows = await backfill(instrument_id, days)
+        print(f"{name}: {windows} windows in {(datetime.now() - started).total_seconds():.1f}s")
+    await db_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ticker")
+    parser.add_argument("--days", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(main(args.ticker, args.days))
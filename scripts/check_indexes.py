@@ -0,0 +1,148 @@
+"""Check that the hot queries of orders/service.py and transactions/service.py use indexes.
+
+Usage: python -m scripts.check_indexes [--rows 2000000]
+
+Seeds scratch users, instruments, orders and trades into the database from
+.env, runs the service functions while capturing the SQL they send, and
+EXPLAINs every captured statement. Exits with status 1 if any of them
+sequentially scans orders or transactions. Seeded rows are deleted at the end.
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from sqlalchemy import event, text
+
+from src.database import engine as db_engine, session_factory
+from src.instruments.service import load_instruments
+from src.orders.service import load_books, get_orders, get_order
+from src.transactions.service import get_history
+from src.users.models import User  # registers users so foreign key column types resolve
+
+
+PREFIX = "idxcheck-"
+USERS = 1000
+INSTRUMENTS = 20
+
+SEED = [
+    """
+    INSERT INTO users (id, name, role, api_key_hash, encrypted_api_key, is_active)
+    SELECT gen_random_uuid(), :prefix || n, 'USER', md5(:prefix || n), md5(:prefix || n || 'e'), true
+    FROM generate_series(1, :users) n
+    """,
+    """
+    INSERT INTO instruments (id, name, ticker)
+    SELECT gen_random_uuid(), :prefix || n, :prefix || n
+    FROM generate_series(1, :instruments) n
+    """,
+    """
+    WITH u AS (SELECT array_agg(id) AS ids FROM users WHERE name LIKE :prefix || '%'),
+         i AS (SELECT array_agg(id) AS ids FROM instruments WHERE ticker LIKE :prefix || '%')
+    INSERT INTO orders (id, user_id, instrument_id, status, direction, timestamp, price, qty, filled)
+    SELECT
+        gen_random_uuid(),
+        u.ids[1 + n % :users],
+        i.ids[1 + n % :instruments],
+        (CASE WHEN n % 50 = 0 THEN 'NEW' WHEN n % 3 = 0 THEN 'CANCELLED' ELSE 'EXECUTED' END)::status,
+        (CASE WHEN n % 2 = 0 THEN 'BUY' ELSE 'SELL' END)::direction,
+        now() - n * interval '1 millisecond',
+        100 + n % 50,
+        10,
+        CASE WHEN n % 50 = 0 THEN 0 WHEN n % 3 = 0 THEN 5 ELSE 10 END
+    FROM generate_series(1, :rows) n, u, i
+    """,
+    """
+    WITH i AS (SELECT array_agg(id) AS ids FROM instruments WHERE ticker LIKE :prefix || '%')
+    INSERT INTO transactions (id, instrument_id, amount, timestamp, price)
+    SELECT gen_random_uuid(), i.ids[1 + n % :instruments], 1 + n % 10, now() - n * interval '1 millisecond', 100 + n % 50
+    FROM generate_series(1, :rows) n, i
+    """,
+    "ANALYZE users",
+    "ANALYZE instruments",
+    "ANALYZE orders",
+    "ANALYZE transactions",
+]
+
+
+captured: list[tuple[str, str, tuple]] = []
+current = None
+
+
+def capture(conn, cursor, statement, parameters, context, executemany):
+    if current is not None:
+        captured.append((current, statement, parameters))
+
+
+def plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+async def seed(rows: int):
+    params = {"prefix": PREFIX, "users": USERS, "instruments": INSTRUMENTS, "rows": rows}
+    async with session_factory() as session:
+        for statement in SEED:
+            await session.execute(text(statement), params)
+        await session.commit()
+        user_id, order_id = (await session.execute(text(
+            "SELECT user_id, id FROM orders WHERE user_id = (SELECT id FROM users WHERE name = :name) LIMIT 1"
+        ), {"name": PREFIX + "1"})).one()
+        instrument_id = (await session.execute(text(
+            "SELECT id FROM instruments WHERE ticker = :ticker"
+        ), {"ticker": PREFIX + "1"})).scalar_one()
+    return str(user_id), str(order_id), str(instrument_id)
+
+
+async def cleanup():
+    async with session_factory() as session:
+        await session.execute(text("DELETE FROM instruments WHERE ticker LIKE :prefix || '%'"), {"prefix": PREFIX})
+        await session.execute(text("DELETE FROM users WHERE name LIKE :prefix || '%'"), {"prefix": PREFIX})
+        await session.commit()
+
+
+async def main(rows: int) -> bool:
+    global current
+    await cleanup()
+    print(f"seeding {rows} orders and {rows} transactions...")
+    user_id, order_id, instrument_id = await seed(rows)
+    await load_instruments()
+    event.listen(db_engine.sync_engine, "before_cursor_execute", capture)
+    calls = {
+        "load_books": lambda: load_books(),
+        "load_books(instrument)": lambda: load_books(instrument_id),
+        "get_orders": lambda: get_orders(user_id, 100),
+        "get_orders(ticker)": lambda: get_orders(user_id, 100, ticker=PREFIX + "1"),
+        "get_order": lambda: get_order(order_id, user_id),
+        "get_history": lambda: get_history(PREFIX + "1", 100),
+    }
+    for name, call in calls.items():
+        current = name
+        await call()
+    current = None
+    event.remove(db_engine.sync_engine, "before_cursor_execute", capture)
+
+    ok = True
+    async with db_engine.connect() as conn:
+        for name, statement, parameters in captured:
+            result = await conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters)
+            explained = result.scalar()
+            plan = (json.loads(explained) if isinstance(explained, str) else explained)[0]["Plan"]
+            nodes = list(plan_nodes(plan))
+            indexes = sorted({n["Index Name"] for n in nodes if "Index Name" in n})
+            seq_scans = sorted({n["Relation Name"] for n in nodes if n["Node Type"] == "Seq Scan"} & {"orders", "transactions"})
+            ok = ok and not seq_scans
+            status = "FAIL" if seq_scans else "ok"
+            detail = f"seq scan on {', '.join(seq_scans)}" if seq_scans else ", ".join(indexes)
+            print(f"{status:>4}  {name:<24} {detail}")
+    await cleanup()
+    await db_engine.dispose()
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main(args.rows)) else 1)
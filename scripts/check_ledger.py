@@ -0,0 +1,194 @@
+"""Check that matching settles balances without creating or destroying funds.
+
+Usage: python -m scripts.check_ledger [--runs 5] [--steps 2000] [--seed 0]
+
+Every run creates scratch users and instruments in the database from .env,
+deposits random amounts and replays a random flow of limit, market and batch
+orders, amends, single and mass cancels and withdrawals through the sequencer,
+several tickers at a time.
+Afterwards it checks that:
+
+- the per-instrument sum of balances equals deposits minus withdrawals,
+- no balance in the table is negative,
+- the in-memory ledger matches the table,
+- the reservations match the resting orders and never exceed the balance,
+- reloading the books and the ledger from the database gives the same state.
+
+Exits with status 1 on the first violation. Scratch rows are deleted at the end.
+"""
+import argparse
+import asyncio
+import random
+import sys
+from collections import defaultdict
+
+from fastapi import HTTPException
+from sqlalchemy import select, text
+
+from src.config import settings
+from src.database import engine as db_engine, session_factory
+from src.balances.ledger import ledger, reservation
+from src.balances.models import Balance
+from src.balances.service import deposit, withdraw, load_balances
+from src.instruments.schemas import CreateInstrument
+from src.instruments.service import create_instrument, load_instruments
+from src.instruments.registry import registry
+from src.orders.engine import engine
+from src.orders.models import Direction
+from src.orders.schemas import LimitOrderBody, MarketOrderBody, AmendOrderBody
+from src.orders.sequencer import sequencer
+from src.orders.service import create_order, create_orders, amend_order, cancel_order, cancel_orders, load_books
+from src.users.models import User  # registers users so foreign key column types resolve
+from src.users.schemas import UserCreate
+from src.users.service import create_user
+
+
+PREFIX = "ledgercheck-"
+USERS = 8
+TICKERS = 3
+BATCH = 16
+
+
+async def cleanup():
+    for ticker in [t for t in registry.ids if t.startswith(PREFIX)]:
+        engine.reset(registry.remove(ticker))
+    async with session_factory() as session:
+        await session.execute(text("DELETE FROM instruments WHERE ticker LIKE :prefix || '%'"), {"prefix": PREFIX})
+        await session.execute(text("DELETE FROM users WHERE name LIKE :prefix || '%'"), {"prefix": PREFIX})
+        await session.commit()
+
+
+def random_order(rng: random.Random, ticker: str, direction: Direction) -> LimitOrderBody:
+    return LimitOrderBody(direction=direction, ticker=ticker, qty=rng.randint(1, 20), price=rng.randint(90, 110))
+
+
+async def step(rng: random.Random, users: list[str], tickers: list[str], expected: dict[str, int]):
+    user_id = rng.choice(users)
+    ticker = rng.choice(tickers)
+    direction = rng.choice([Direction.BUY, Direction.SELL])
+    roll = rng.random()
+    try:
+        if roll < 0.5:
+            await sequencer.submit(ticker, create_order, user_id, random_order(rng, ticker, direction))
+        elif roll < 0.7:
+            order = MarketOrderBody(direction=direction, ticker=ticker, qty=rng.randint(1, 30))
+            await sequencer.submit(ticker, create_order, user_id, order)
+        elif roll < 0.75:
+            orders = [random_order(rng, ticker, rng.choice([Direction.BUY, Direction.SELL])) for _ in range(rng.randint(1, 10))]
+            await sequencer.submit(ticker, create_orders, user_id, ticker, orders)
+        elif roll < 0.77:
+            await sequencer.submit(ticker, cancel_orders, user_id, ticker, rng.choice([None, direction]))
+        elif roll < 0.95:
+            open_orders = list(engine.users.get(user_id, {}).values())
+            if open_orders:
+                resting = rng.choice(open_orders)
+                if rng.random() < 0.5:
+                    await sequencer.submit(engine.ticker_of(resting.id), cancel_order, user_id, resting.id)
+                else:
+                    amend = AmendOrderBody(
+                        qty=rng.choice([None, resting.filled + rng.randint(1, 20)]),
+                        price=rng.choice([None, rng.randint(90, 110)])
+                    )
+                    await sequencer.submit(engine.ticker_of(resting.id), amend_order, user_id, resting.id, amend)
+        else:
+            instrument_id = registry.get_id(rng.choice(tickers + [settings.QUOTE_TICKER]))
+            amount = rng.randint(1, 500)
+            await withdraw(user_id, instrument_id, amount)
+            expected[instrument_id] -= amount
+    except HTTPException:
+        # rejected, or the order was filled or cancelled by a concurrent step;
+        # either way it must leave no trace, which check() verifies
+        pass
+
+
+def snapshot(users: set[str]) -> tuple[dict, dict]:
+    amounts = {key: amount for key, amount in ledger.amounts.items() if key[0] in users and amount}
+    reserved = {key: qty for key, qty in ledger.reserved.items() if key[0] in users and qty}
+    return amounts, reserved
+
+
+async def check(users: list[str], expected: dict[str, int]) -> list[str]:
+    errors = []
+    async with session_factory() as session:
+        result = await session.execute(
+            select(Balance.user_id, Balance.instrument_id, Balance.amount).where(Balance.user_id.in_(users))
+        )
+        rows = result.all()
+    stored = {(str(r.user_id), str(r.instrument_id)): r.amount for r in rows if r.amount}
+    totals = defaultdict(int)
+    for (_, instrument_id), amount in stored.items():
+        totals[instrument_id] += amount
+    for instrument_id, amount in expected.items():
+        if totals[instrument_id] != amount:
+            errors.append(f"{registry.get_ticker(instrument_id)}: balances sum to {totals[instrument_id]}, expected {amount}")
+    errors += [f"negative balance {key}: {amount}" for key, amount in stored.items() if amount < 0]
+
+    members = set(users)
+    amounts, reserved = snapshot(members)
+    if amounts != stored:
+        errors.append("ledger amounts differ from the balances table")
+    derived = defaultdict(int)
+    quote_id = registry.get_id(settings.QUOTE_TICKER)
+    for order in engine.orders.values():
+        if order.user_id in members:
+            key, qty = reservation(order, quote_id)
+            derived[key] += qty
+    if reserved != {key: qty for key, qty in derived.items() if qty}:
+        errors.append("ledger reservations differ from resting orders")
+    errors += [f"over-reserved {key}: {qty} of {amounts.get(key, 0)}" for key, qty in reserved.items() if qty > amounts.get(key, 0)]
+
+    await load_books()
+    await load_balances()
+    if snapshot(members) != (amounts, reserved):
+        errors.append("ledger reloaded from the database differs from the live one")
+    return errors
+
+
+async def run(seed: int, steps: int) -> list[str]:
+    rng = random.Random(seed)
+    users = [(await create_user(UserCreate(name=f"{PREFIX}{seed}-{n}"))).id for n in range(USERS)]
+    tickers = [f"{PREFIX}{seed}-{n}" for n in range(TICKERS)]
+    for ticker in tickers:
+        await create_instrument(CreateInstrument(name=ticker, ticker=ticker))
+    expected = defaultdict(int)
+    for user_id in users:
+        for ticker in tickers + [settings.QUOTE_TICKER]:
+            instrument_id = registry.get_id(ticker)
+            amount = rng.randint(0, 100) if ticker != settings.QUOTE_TICKER else rng.randint(0, 20_000)
+            if amount:
+                await deposit(user_id, instrument_id, amount)
+                expected[instrument_id] += amount
+    for _ in range(0, steps, BATCH):
+        await asyncio.gather(*(step(rng, users, tickers, expected) for _ in range(BATCH)))
+    return await check(users, expected)
+
+
+async def main(runs: int, steps: int, seed: int) -> bool:
+    settings.QUOTE_TICKER = PREFIX + "QUOTE"
+    await load_instruments()
+    await cleanup()
+    await create_instrument(CreateInstrument(name=settings.QUOTE_TICKER, ticker=settings.QUOTE_TICKER))
+    await load_books()
+    await load_balances()
+    ok = True
+    for n in range(seed, seed + runs):
+        errors = await run(n, steps)
+        print(f"{'FAIL' if errors else 'ok':>4}  seed {n}: {len(engine.orders)} resting orders")
+        for error in errors:
+            print(f"      {error}")
+        ok = ok and not errors
+        if not ok:
+            break
+    await sequencer.stop()
+    await cleanup()
+    await db_engine.dispose()
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main(args.runs, args.steps, args.seed)) else 1)
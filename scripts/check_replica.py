@@ -0,0 +1,83 @@
+"""Check that read-only endpoints use the replica and fall back when it lags.
+
+Usage: REPLICA_DATABASE_URL=user@host:port/db python -m scripts.check_replica
+
+A local streaming replica of the database from .env is enough, e.g.
+
+    pg_basebackup -h localhost -p 5432 -U postgres -D /tmp/replica -R -X stream
+    pg_ctl -D /tmp/replica -o "-p 5433" start
+
+Through the in-process app it registers a scratch user, deposits to it and
+waits for the replica to replay the deposit. It then counts the statements
+each engine runs for GET /balance, GET /public/transactions (database path)
+and GET /public/candles. With the replica fresh they must all go to the
+replica; with its lag forced above REPLICA_MAX_LAG they must all go to the
+primary. Exits with status 1 otherwise.
+"""
+import asyncio
+import sys
+from collections import Counter
+
+import httpx
+from sqlalchemy import event
+
+from benchmarks.load import in_process_admin
+from src.app import app
+from src.config import settings
+from src.database import engine, read_engine
+from src.replica import replica
+
+
+async def reads(client: httpx.AsyncClient, headers: dict, counts: Counter) -> Counter:
+    before = counts.copy()
+    balance = await client.get("/balance", headers=headers)
+    await client.get(f"/public/transactions/{settings.QUOTE_TICKER}", params={"since": "2000-01-01T00:00:00Z"})
+    await client.get(f"/public/candles/{settings.QUOTE_TICKER}")
+    counts = counts - before
+    counts["balance"] = balance.json().get(settings.QUOTE_TICKER, 0)
+    return counts
+
+
+async def main() -> bool:
+    if not replica.configured:
+        print("REPLICA_DATABASE_URL is not set")
+        return False
+    counts = Counter()
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *_: counts.update(["primary"]))
+    event.listen(read_engine.sync_engine, "before_cursor_execute", lambda *_: counts.update(["replica"]))
+    ok = True
+    async with app.router.lifespan_context(app):
+        admin, admin_id = await in_process_admin()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://check/api/v1") as client:
+            user = (await client.post("/public/register", json={"name": "check-replica"})).json()
+            headers = {"Authorization": "TOKEN " + user["api_key"]}
+            try:
+                await client.post(
+                    "/admin/balance/deposit",
+                    json={"user_id": user["id"], "ticker": settings.QUOTE_TICKER, "amount": 100},
+                    headers=admin
+                )
+                # authenticate once so the key is cached and the reads below run no auth query
+                await client.get("/balance", headers=headers)
+                for _ in range(50):
+                    await replica.check()
+                    fresh = await reads(client, headers, counts)
+                    if replica.fresh and fresh["balance"] == 100:
+                        break
+                    await asyncio.sleep(0.1)
+                print(f"replica fresh (lag {replica.lag}): {dict(fresh)}")
+                ok &= replica.fresh and fresh["replica"] == 3 and not fresh["primary"] and fresh["balance"] == 100
+
+                replica.lag = settings.REPLICA_MAX_LAG + 1
+                lagging = await reads(client, headers, counts)
+                print(f"replica lagging (lag {replica.lag}): {dict(lagging)}")
+                ok &= lagging["primary"] == 3 and not lagging["replica"]
+            finally:
+                await client.delete(f"/admin/user/{user['id']}", headers=admin)
+                await client.delete(f"/admin/user/{admin_id}", headers=admin)
+    print("ok" if ok else "FAILED")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
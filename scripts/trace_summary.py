@@ -0,0 +1,63 @@
+"""Per-phase latency from a trace file written with TRACE_SAMPLE_RATE > 0.
+
+Usage: python -m scripts.trace_summary [trace.json] [--tail 1]
+
+For every traced call (create_order, cancel_order, ...) prints p50/p95/p99 of
+the call and of each of its phases, then where the time went in the slowest
+--tail percent of calls: each phase's share of their summed wall time,
+including the sequencer queue wait.
+"""
+import argparse
+import json
+from collections import defaultdict
+
+
+def load(path: str) -> list[dict]:
+    # the writer never closes the array
+    text = open(path).read().rstrip().rstrip(",")
+    return json.loads(text if text.endswith("]") else text + "]")
+
+
+def percentile(ordered: list[float], p: int) -> float:
+    return ordered[min(len(ordered) - 1, len(ordered) * p // 100)] / 1000
+
+
+def main(path: str, tail: float):
+    traces: dict[tuple[int, int], dict] = defaultdict(lambda: {"root": None, "phases": defaultdict(float)})
+    events = load(path)
+    roots = {event["args"]["name"].split(" #")[0] for event in events if event["ph"] == "M"}
+    for event in events:
+        if event["ph"] != "X":
+            continue
+        trace = traces[event["pid"], event["tid"]]
+        if event["name"] in roots:
+            trace["root"] = event
+        else:
+            trace["phases"][event["name"]] += event["dur"]
+
+    by_root = defaultdict(list)
+    for trace in traces.values():
+        if trace["root"] is not None:
+            by_root[trace["root"]["name"]].append(trace)
+    for name, calls in sorted(by_root.items()):
+        calls.sort(key=lambda t: t["root"]["dur"] + t["phases"].get("queue", 0))
+        print(f"{name}: {len(calls)} calls")
+        print(f"  {'phase':<14} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        phases = sorted({p for t in calls for p in t["phases"]})
+        durations = {name: sorted(t["root"]["dur"] for t in calls)}
+        durations.update({p: sorted(t["phases"][p] for t in calls if p in t["phases"]) for p in phases})
+        for phase, ordered in durations.items():
+            print(f"  {phase:<14} {percentile(ordered, 50):>8.2f} {percentile(ordered, 95):>8.2f} {percentile(ordered, 99):>8.2f}")
+        slowest = calls[-max(1, int(len(calls) * tail / 100)):]
+        total = sum(t["root"]["dur"] + t["phases"].get("queue", 0) for t in slowest)
+        print(f"  slowest {len(slowest)}: " + ", ".join(
+            f"{p} {sum(t['phases'].get(p, 0) for t in slowest) / total * 100:.0f}%" for p in phases
+        ))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", nargs="?", default="trace.json")
+    parser.add_argument("--tail", type=float, default=1)
+    args = parser.parse_args()
+    main(args.path, args.tail)
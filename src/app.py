@@ -1,14 +1,58 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
 from src.routers.public import public_router
 from src.routers.admin import admin_router
 from src.routers.balance import balance_router
 from src.routers.order import order_router
+from src.routers.metrics import metrics_router
+from src.instruments.service import load_instruments
+from src.orders.service import load_books
+from src.transactions.service import load_recent_trades
+from src.balances.service import load_balances
+from src.orders.sequencer import sequencer
+from src.config import settings
+from src.database import engine, read_engine
+from src.replica import replica
+from src.metrics import MetricsMiddleware, instrument
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await load_instruments()
+    await load_books()
+    await load_balances()
+    await load_recent_trades()
+    await replica.start()
+    yield
+    await replica.stop()
+    await sequencer.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 base_prefix = "/api/v1"
 app.include_router(public_router, prefix=base_prefix)
 app.include_router(admin_router, prefix=base_prefix)
 app.include_router(balance_router, prefix=base_prefix)
 app.include_router(order_router, prefix=base_prefix)
+engines = [engine] if read_engine is engine else [engine, read_engine]
+
+if settings.METRICS_ENABLED:
+    instrument(engine)
+    if replica.configured:
+        instrument(read_engine, "db_replica_pool_checked_out")
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router)
+
+if settings.SLOW_QUERY_THRESHOLD > 0:
+    from src.slowlog import install as install_slowlog
+
+    for db in engines:
+        install_slowlog(db)
+
+if settings.PROFILE_ENABLED:
+    from src.profiler import ProfilerMiddleware, install
+
+    for db in engines:
+        install(db)
+    app.add_middleware(ProfilerMiddleware)
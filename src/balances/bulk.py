@@ -0,0 +1,167 @@
+import csv
+import json
+from typing import AsyncIterator
+from uuid import UUID
+
+from src.database import engine
+from src.metrics import measured
+from src.balances.ledger import ledger
+from src.balances.schemas import BulkResult, RejectedRow
+from src.instruments.registry import registry
+
+
+COPY_CHUNK = 100_000
+MAX_REPORTED = 1000
+MAX_AMOUNT = 2 ** 31 - 1
+
+
+async def read_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[list[str]]:
+    tail = b""
+    async for chunk in stream:
+        lines = (tail + chunk).split(b"\n")
+        tail = lines.pop()
+        # invalid UTF-8 becomes U+FFFD, so the row fails validation on its own
+        # instead of failing the upload
+        yield [line.decode(errors="replace").strip() for line in lines]
+    yield [tail.decode(errors="replace").strip()]
+
+def parse_csv(lines: list[str]) -> list[tuple | None]:
+    return [tuple(row) if len(row) == 3 else None for row in csv.reader(lines)]
+
+def parse_ndjson(lines: list[str]) -> list[tuple | None]:
+    rows = []
+    for line in lines:
+        try:
+            item = json.loads(line)
+            rows.append((item["user_id"], item["ticker"], item["amount"]))
+        except (ValueError, TypeError, KeyError):
+            rows.append(None)
+    return rows
+
+
+class Batch:
+    # Net amount per (user_id, instrument_id) with the input lines it came from,
+    # so rejections can be reported per row while only one row per key is staged.
+    def __init__(self):
+        self.amounts: dict[tuple[str, str], int] = {}
+        self.lines: dict[tuple[str, str], int] = {}
+        self.more_lines: dict[tuple[str, str], list[int]] = {}
+        self.rejected: list[tuple[int, str]] = []
+        self.users: dict[str, str] = {}
+        self.rows = 0
+
+    def add(self, line: int, row: tuple | None):
+        self.rows += 1
+        if row is None:
+            self.rejected.append((line, "Invalid row"))
+            return
+        user_id, ticker, amount = row
+        try:
+            # the same user usually shows up once per instrument
+            user_id = self.users.get(user_id) or self.users.setdefault(user_id, str(UUID(str(user_id))))
+            if isinstance(amount, float):
+                raise ValueError
+            amount = int(amount)
+        except (ValueError, TypeError):
+            self.rejected.append((line, "Invalid row"))
+            return
+        instrument_id = registry.get_id(ticker) if isinstance(ticker, str) else None
+        if instrument_id is None:
+            self.rejected.append((line, "Instrument not exists"))
+            return
+        if not amount or abs(amount) > MAX_AMOUNT:
+            self.rejected.append((line, "Invalid amount"))
+            return
+        key = (user_id, instrument_id)
+        if key in self.amounts:
+            self.amounts[key] += amount
+            self.more_lines.setdefault(key, []).append(line)
+        else:
+            self.amounts[key] = amount
+            self.lines[key] = line
+
+    async def csv(self) -> AsyncIterator[bytes]:
+        # staged as CSV text: COPY parses it faster than asyncpg encodes records
+        rows = list(self.amounts.items())
+        for start in range(0, len(rows), COPY_CHUNK):
+            yield "".join(f"{u},{i},{amount}\n" for (u, i), amount in rows[start:start + COPY_CHUNK]).encode()
+
+    def reject(self, key: tuple[str, str], reason: str):
+        del self.amounts[key]
+        self.rejected.append((self.lines.pop(key), reason))
+        self.rejected.extend((line, reason) for line in self.more_lines.pop(key, []))
+
+
+async def read_batch(stream: AsyncIterator[bytes], ndjson: bool) -> Batch:
+    parse = parse_ndjson if ndjson else parse_csv
+    batch = Batch()
+    line = 0
+    async for lines in read_lines(stream):
+        numbered = []
+        for text in lines:
+            line += 1
+            if text and not (line == 1 and text.startswith("user_id")):
+                numbered.append((line, text))
+        rows = parse([text for _, text in numbered])
+        for (number, _), row in zip(numbered, rows):
+            batch.add(number, row)
+    return batch
+
+@measured
+async def ingest(stream: AsyncIterator[bytes], ndjson: bool) -> BulkResult:
+    # Rows of unknown users, keys whose net withdrawal exceeds the available
+    # balance and keys whose balance would overflow the int4 column are rejected;
+    # everything else is merged in one statement.
+    batch = await read_batch(stream, ndjson)
+    debits = {}
+    try:
+        async with engine.connect() as conn:
+            raw = (await conn.get_raw_connection()).driver_connection
+            async with raw.transaction():
+                await raw.execute(
+                    "CREATE TEMP TABLE bulk_balances (user_id uuid, instrument_id uuid, amount bigint) ON COMMIT DROP"
+                )
+                await raw.copy_to_table("bulk_balances", source=batch.csv(), format="csv")
+                unknown = await raw.fetch(
+                    "DELETE FROM bulk_balances b WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.id = b.user_id) "
+                    "RETURNING user_id, instrument_id"
+                )
+                for row in unknown:
+                    batch.reject((str(row["user_id"]), str(row["instrument_id"])), "User not exists")
+
+                # withdrawals are taken from the ledger before the write, like withdraw() does
+                refused = []
+                for key, amount in batch.amounts.items():
+                    if amount < 0 and ledger.available(*key) < -amount:
+                        refused.append((key, "Insufficient balance"))
+                    elif amount > 0 and ledger.amounts.get(key, 0) + amount > MAX_AMOUNT:
+                        refused.append((key, "Balance limit exceeded"))
+                    elif amount < 0:
+                        debits[key] = amount
+                ledger.apply(debits, {})
+                for key, reason in refused:
+                    batch.reject(key, reason)
+                if refused:
+                    await raw.execute(
+                        "DELETE FROM bulk_balances b USING unnest($1::uuid[], $2::uuid[]) r(user_id, instrument_id) "
+                        "WHERE b.user_id = r.user_id AND b.instrument_id = r.instrument_id",
+                        [UUID(u) for (u, _), _ in refused],
+                        [UUID(i) for (_, i), _ in refused]
+                    )
+                # sorted like apply_deltas so it locks rows in the same order as settlements
+                await raw.execute(
+                    "INSERT INTO balances (id, user_id, instrument_id, amount) "
+                    "SELECT gen_random_uuid(), user_id, instrument_id, amount FROM bulk_balances "
+                    "ORDER BY user_id, instrument_id "
+                    "ON CONFLICT (user_id, instrument_id) DO UPDATE SET amount = balances.amount + excluded.amount"
+                )
+    except Exception:
+        ledger.apply(debits, {}, -1)
+        raise
+    ledger.apply({key: amount for key, amount in batch.amounts.items() if amount > 0}, {})
+    batch.rejected.sort()
+    return BulkResult(
+        accepted=batch.rows - len(batch.rejected),
+        rejected=len(batch.rejected),
+        rows=[RejectedRow(line=line, reason=reason) for line, reason in batch.rejected[:MAX_REPORTED]]
+    )
@@ -0,0 +1,83 @@
+from collections import defaultdict
+
+from src.orders.engine import RestingOrder, Fill
+from src.orders.models import Direction
+
+
+Key = tuple[str, str]
+Deltas = tuple[dict[Key, int], dict[Key, int]]
+
+
+class Ledger:
+    # Amounts per (user_id, instrument_id) mirror the balances table; reservations
+    # held by resting orders exist only here and are rebuilt from the book on load.
+    def __init__(self):
+        self.amounts: dict[Key, int] = defaultdict(int)
+        self.reserved: dict[Key, int] = defaultdict(int)
+
+    def available(self, user_id: str, instrument_id: str) -> int:
+        key = (user_id, instrument_id)
+        return self.amounts.get(key, 0) - self.reserved.get(key, 0)
+
+    def apply(self, amounts: dict[Key, int], reserved: dict[Key, int], sign: int = 1):
+        for key, delta in amounts.items():
+            self.amounts[key] += sign * delta
+        for key, delta in reserved.items():
+            self.reserved[key] += sign * delta
+            if not self.reserved[key]:
+                del self.reserved[key]
+
+    def drop(self, instrument_id: str):
+        for table in (self.amounts, self.reserved):
+            for key in [key for key in table if key[1] == instrument_id]:
+                del table[key]
+
+    def clear(self):
+        self.amounts.clear()
+        self.reserved.clear()
+
+
+def reservation(order: RestingOrder, quote_id: str) -> tuple[Key, int]:
+    if order.direction == Direction.BUY:
+        return (order.user_id, quote_id), order.price * order.remaining
+    return (order.user_id, order.instrument_id), order.remaining
+
+def partition(amounts: dict[Key, int], reserved: dict[Key, int]) -> tuple[Deltas, Deltas]:
+    # Splits settlement deltas into what takes funds (debits, new reservations),
+    # applied before the write so concurrent orders see them spent, and what frees
+    # them (credits, released reservations), applied only once the write commits:
+    # funds a failed write takes back must never have been spendable.
+    taken = ({k: d for k, d in amounts.items() if d < 0}, {k: d for k, d in reserved.items() if d > 0})
+    freed = ({k: d for k, d in amounts.items() if d > 0}, {k: d for k, d in reserved.items() if d < 0})
+    return taken, freed
+
+def merge(total: Deltas, part: Deltas):
+    for totals, deltas in zip(total, part):
+        for key, delta in deltas.items():
+            totals[key] += delta
+
+def settle(taker: RestingOrder, fills: list[Fill], quote_id: str) -> tuple[dict[Key, int], dict[Key, int]]:
+    # Balance and reservation deltas of one match, including the reservation of
+    # the taker's resting remainder.
+    amounts = defaultdict(int)
+    reserved = defaultdict(int)
+    base_id = taker.instrument_id
+    for fill in fills:
+        maker = fill.maker
+        buyer, seller = (taker, maker) if taker.direction == Direction.BUY else (maker, taker)
+        cost = fill.price * fill.qty
+        amounts[buyer.user_id, base_id] += fill.qty
+        amounts[buyer.user_id, quote_id] -= cost
+        amounts[seller.user_id, base_id] -= fill.qty
+        amounts[seller.user_id, quote_id] += cost
+        if maker is buyer:
+            reserved[maker.user_id, quote_id] -= cost
+        else:
+            reserved[maker.user_id, base_id] -= fill.qty
+    if taker.price is not None and taker.remaining:
+        key, qty = reservation(taker, quote_id)
+        reserved[key] += qty
+    return amounts, reserved
+
+
+ledger = Ledger()
@@ -1,6 +1,16 @@
+from uuid import UUID
 from pydantic import BaseModel
 
 class Balance(BaseModel):
-    user_id: str
+    user_id: UUID
     ticker: str
     amount: int
+
+class RejectedRow(BaseModel):
+    line: int
+    reason: str
+
+class BulkResult(BaseModel):
+    accepted: int
+    rejected: int
+    rows: list[RejectedRow]
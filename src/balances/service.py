@@ -1,12 +1,47 @@
 from fastapi import HTTPException
 from sqlalchemy.dialects.postgresql import insert
 from uuid import uuid4
-from sqlalchemy import update, text, select
+from sqlalchemy import update, select
 
+from src.config import settings
 from src.database import session_factory
+from src.metrics import measured
+from src.replica import replica
 from src.balances.models import Balance
+from src.balances.ledger import ledger, reservation
+from src.instruments.registry import registry
+from src.orders.engine import engine
 
 
+# Must run after load_books: reservations are derived from the resting orders.
+async def load_balances():
+    async with session_factory() as session:
+        result = await session.execute(select(Balance.user_id, Balance.instrument_id, Balance.amount))
+        rows = result.all()
+    ledger.clear()
+    for row in rows:
+        ledger.amounts[str(row.user_id), str(row.instrument_id)] = row.amount
+    quote_id = registry.get_id(settings.QUOTE_TICKER)
+    for order in engine.orders.values():
+        key, qty = reservation(order, quote_id)
+        ledger.reserved[key] += qty
+
+async def apply_deltas(session, deltas: dict[tuple[str, str], int]):
+    # sorted so concurrent settlements lock shared rows in the same order
+    rows = sorted((key, delta) for key, delta in deltas.items() if delta)
+    if not rows:
+        return
+    stmt = insert(Balance).values([
+        {"id": uuid4(), "user_id": user_id, "instrument_id": instrument_id, "amount": delta}
+        for (user_id, instrument_id), delta in rows
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'instrument_id'],
+        set_={'amount': Balance.amount + stmt.excluded.amount}
+    )
+    await session.execute(stmt)
+
+@measured
 async def deposit(user_id: str, instrument_id: str, amount: int):
     stmt = insert(Balance).values(
         id=uuid4(),
@@ -21,28 +56,39 @@ async def deposit(user_id: str, instrument_id: str, amount: int):
     async with session_factory() as session:
         await session.execute(stmt)
         await session.commit()
+    ledger.amounts[user_id, instrument_id] += amount
 
+@measured
 async def withdraw(user_id: str, instrument_id: str, amount: int):
-    async with session_factory() as session:
-        result = await session.execute(
-            text("SELECT amount FROM balances WHERE user_id = :user_id AND ticker = :instrument_id FOR UPDATE"),
-            {"user_id": user_id, "instrument_id": instrument_id}
-        )
-        current = result.first()
-
-        if not current or current.amount < amount:
-            raise HTTPException(status_code=400, detail="Insufficient balance")
-
-        await session.execute(
-            update(Balance)
-                .where(Balance.user_id == user_id, Balance.instrument_id == instrument_id)
-                .values(amount=Balance.amount - amount)
-        )
-        await session.commit()
+    if ledger.available(user_id, instrument_id) < amount:
+        raise HTTPException(status_code=400, detail="Insufficient balance")
+    # taken from the ledger up front so orders placed meanwhile cannot spend it
+    deltas = {(user_id, instrument_id): -amount}
+    ledger.apply(deltas, {})
+    try:
+        async with session_factory() as session:
+            result = await session.execute(
+                update(Balance)
+                    .where(Balance.user_id == user_id, Balance.instrument_id == instrument_id, Balance.amount >= amount)
+                    .values(amount=Balance.amount - amount)
+                    .returning(Balance.id)
+            )
+            updated = result.first()
+            await session.commit()
+    except Exception:
+        ledger.apply(deltas, {}, -1)
+        raise
+    if updated is None:
+        ledger.apply(deltas, {}, -1)
+        raise HTTPException(status_code=400, detail="Insufficient balance")
 
+@measured
 async def get_all(user_id: str) -> dict[str, int]:
-    query = select(Balance.ticker, Balance.amount).where(Balance.user_id == user_id, Balance.amount > 0)
-    async with session_factory() as session:
+    query = select(Balance.instrument_id, Balance.amount).where(Balance.user_id == user_id, Balance.amount > 0)
+    async with replica.session() as session:
         result = await session.execute(query)
-        balances = {row.ticker: row.amount for row in result.fetchall()}
+        balances = {
+            registry.get_ticker(str(row.instrument_id)): row.amount
+            for row in result.fetchall()
+        }
         return balances
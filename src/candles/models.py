@@ -0,0 +1,18 @@
+from sqlalchemy import BigInteger, DateTime, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from uuid import UUID
+from datetime import datetime
+
+from src.database import Base
+
+class Candle(Base):
+    __tablename__ = "candles"
+
+    instrument_id: Mapped[UUID] = mapped_column(ForeignKey('instruments.id', ondelete='CASCADE'), primary_key=True)
+    period: Mapped[int] = mapped_column(primary_key=True)
+    start: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    open: Mapped[int] = mapped_column(nullable=False)
+    high: Mapped[int] = mapped_column(nullable=False)
+    low: Mapped[int] = mapped_column(nullable=False)
+    close: Mapped[int] = mapped_column(nullable=False)
+    volume: Mapped[int] = mapped_column(BigInteger, nullable=False)
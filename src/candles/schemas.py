@@ -0,0 +1,26 @@
+from pydantic import BaseModel
+from datetime import datetime
+from enum import Enum
+
+class Interval(str, Enum):
+    S1 = "1s"
+    M1 = "1m"
+    M5 = "5m"
+    H1 = "1h"
+    D1 = "1d"
+
+PERIODS = {
+    Interval.S1: 1,
+    Interval.M1: 60,
+    Interval.M5: 300,
+    Interval.H1: 3600,
+    Interval.D1: 86400,
+}
+
+class CandleModel(BaseModel):
+    start: datetime
+    open: int
+    high: int
+    low: int
+    close: int
+    volume: int
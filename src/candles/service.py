@@ -0,0 +1,87 @@
+from datetime import datetime
+from pytz import UTC
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from src.metrics import measured
+from src.pagination import as_utc
+from src.replica import replica
+from src.candles.models import Candle
+from src.candles.schemas import Interval, PERIODS, CandleModel
+from src.instruments.registry import registry
+from src.orders.engine import Fill
+
+
+def bucket(timestamp: datetime, period: int) -> datetime:
+    seconds = int(timestamp.timestamp())
+    return datetime.fromtimestamp(seconds - seconds % period, UTC)
+
+async def update_candles(session, instrument_id: str, fills: list[Fill], timestamp: datetime):
+    # every fill of one match shares its timestamp, so each period gets exactly one row
+    if not fills:
+        return
+    prices = [fill.price for fill in fills]
+    stmt = insert(Candle).values([
+        {
+            "instrument_id": instrument_id,
+            "period": period,
+            "start": bucket(timestamp, period),
+            "open": prices[0],
+            "high": max(prices),
+            "low": min(prices),
+            "close": prices[-1],
+            "volume": sum(fill.qty for fill in fills)
+        } for period in PERIODS.values()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Candle.instrument_id, Candle.period, Candle.start],
+        set_={
+            "high": func.greatest(Candle.high, stmt.excluded.high),
+            "low": func.least(Candle.low, stmt.excluded.low),
+            "close": stmt.excluded.close,
+            "volume": Candle.volume + stmt.excluded.volume
+        }
+    )
+    await session.execute(stmt)
+
+@measured
+async def get_candles(
+    ticker: str,
+    interval: Interval,
+    limit: int,
+    since: datetime | None = None,
+    until: datetime | None = None
+) -> list[CandleModel]:
+    instrument_id = registry.get_id(ticker)
+    if instrument_id is None:
+        return []
+    # a naive since would otherwise be bucketed as server-local time
+    since, until = as_utc(since), as_utc(until)
+    query = select(
+        Candle.start,
+        Candle.open,
+        Candle.high,
+        Candle.low,
+        Candle.close,
+        Candle.volume
+    ).where(
+        Candle.instrument_id == instrument_id,
+        Candle.period == PERIODS[interval]
+    )
+    if since:
+        query = query.where(Candle.start >= bucket(since, PERIODS[interval]))
+    if until:
+        query = query.where(Candle.start < until)
+    if since and not until:
+        query = query.order_by(Candle.start).limit(limit)
+    else:
+        # without a lower bound the newest candles are the interesting ones
+        query = query.order_by(Candle.start.desc()).limit(limit)
+    async with replica.session() as session:
+        result = await session.execute(query)
+        rows = result.all()
+    rows.sort(key=lambda c: c.start)
+    return [
+        CandleModel(start=c.start, open=c.open, high=c.high, low=c.low, close=c.close, volume=c.volume)
+        for c in rows
+    ]
@@ -5,11 +5,32 @@ class Settings(BaseSettings):
     DATABASE_URL: str
     HASH_KEY: str
     ENCRYPTION_KEY: str
+    AUTH_CACHE_SIZE: int = 100_000
+    AUTH_CACHE_TTL: float = 300.0
+    RECENT_TRADES: int = 1000
+    QUOTE_TICKER: str = "RUB"
+    METRICS_ENABLED: bool = True
+    TRACE_SAMPLE_RATE: float = 0.0
+    TRACE_FILE: str = "trace.json"
+    PROFILE_ENABLED: bool = False
+    PROFILE_THRESHOLD: float = 1.0
+    PROFILE_INTERVAL: float = 0.005
+    PROFILE_DIR: str = "profiles"
+    PROFILE_KEEP: int = 200
+    SLOW_QUERY_THRESHOLD: float = 0.0
+    SLOW_QUERY_EXPLAIN_EVERY: float = 300.0
+    REPLICA_DATABASE_URL: str | None = None
+    REPLICA_MAX_LAG: float = 5.0
+    REPLICA_CHECK_INTERVAL: float = 1.0
 
     @property
     def DATABASE_URL_asyncpg(self):
         return "postgresql+asyncpg://" + self.DATABASE_URL
     
+    @property
+    def REPLICA_DATABASE_URL_asyncpg(self):
+        return "postgresql+asyncpg://" + self.REPLICA_DATABASE_URL
+
     @property
     def DATABASE_URL_default(self):
         return "postgresql://" + "userone:qwertyuseronepostgrestochka@c-c9qpfjjk5123cemgdb8q.rw.mdb.yandexcloud.net:6432/market"
@@ -1,13 +1,26 @@
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from src.config import settings
+from src.metrics import TimedPool
 from sqlalchemy.orm import DeclarativeBase
 
 engine = create_async_engine(
     url=settings.DATABASE_URL_asyncpg,
-    echo=False
+    echo=False,
+    poolclass=TimedPool if settings.METRICS_ENABLED else AsyncAdaptedQueuePool
 )
 
 session_factory = async_sessionmaker(engine)
 
+# read-only queries that tolerate REPLICA_MAX_LAG of staleness go through
+# src/replica.py; without a replica this is the primary
+read_engine = create_async_engine(
+    url=settings.REPLICA_DATABASE_URL_asyncpg,
+    echo=False,
+    poolclass=TimedPool if settings.METRICS_ENABLED else AsyncAdaptedQueuePool
+) if settings.REPLICA_DATABASE_URL else engine
+
+read_session_factory = async_sessionmaker(read_engine)
+
 class Base(DeclarativeBase):
     pass
\ No newline at end of file
@@ -0,0 +1,37 @@
+from src.instruments.schemas import InstrumentModel
+
+
+class InstrumentRegistry:
+    def __init__(self):
+        self.ids: dict[str, str] = {}
+        self.tickers: dict[str, str] = {}
+        self.instruments: dict[str, InstrumentModel] = {}
+
+    def add(self, id: str, name: str, ticker: str):
+        self.ids[ticker] = id
+        self.tickers[id] = ticker
+        self.instruments[ticker] = InstrumentModel(name=name, ticker=ticker)
+
+    def remove(self, ticker: str) -> str | None:
+        id = self.ids.pop(ticker, None)
+        if id is not None:
+            del self.tickers[id]
+            del self.instruments[ticker]
+        return id
+
+    def clear(self):
+        self.ids.clear()
+        self.tickers.clear()
+        self.instruments.clear()
+
+    def get_id(self, ticker: str) -> str | None:
+        return self.ids.get(ticker)
+
+    def get_ticker(self, id: str) -> str | None:
+        return self.tickers.get(id)
+
+    def all(self) -> list[InstrumentModel]:
+        return list(self.instruments.values())
+
+
+registry = InstrumentRegistry()
@@ -1,12 +1,29 @@
+from collections import defaultdict
 from fastapi import HTTPException
 from sqlalchemy import insert, select, delete
 from uuid import uuid4
 
+from src.config import settings
 from src.database import session_factory
+from src.metrics import measured
 from src.instruments.models import Instrument
+from src.instruments.registry import registry
 from src.instruments.schemas import CreateInstrument, InstrumentModel
+from src.orders.engine import engine
+from src.transactions.recent import recent_trades
+from src.marketdata.feed import feed
+from src.balances.ledger import ledger, reservation
 
 
+async def load_instruments():
+    async with session_factory() as session:
+        result = await session.execute(select(Instrument.id, Instrument.name, Instrument.ticker))
+        rows = result.all()
+    registry.clear()
+    for row in rows:
+        registry.add(str(row.id), row.name, row.ticker)
+
+@measured
 async def create_instrument(instrument: CreateInstrument) -> InstrumentModel:
     instruments = Instrument.__table__
     query = insert(instruments).values(
@@ -20,6 +37,7 @@ async def create_instrument(instrument: CreateInstrument) -> InstrumentModel:
             result = await session.execute(query)
             entity = result.fetchone()
             await session.commit()
+            registry.add(str(entity.id), entity.name, entity.ticker)
             return InstrumentModel(
                 name=entity.name,
                 ticker=entity.ticker
@@ -29,19 +47,31 @@ async def create_instrument(instrument: CreateInstrument) -> InstrumentModel:
             raise HTTPException(status_code=400, detail="Instrument with this name or ticker already exists")
         raise e
 
-async def get_instruments() -> list[Instrument]:
-    async with session_factory() as session:
-        result = await session.execute(select(Instrument.name, Instrument.ticker))
-        return [InstrumentModel(name=i.name, ticker=i.ticker) for i in result.all()]
+@measured
+async def get_instruments() -> list[InstrumentModel]:
+    return registry.all()
 
 async def get_instrument_id(ticker: str) -> str | None:
-    async with session_factory() as session:
-        result = await session.execute(select(Instrument.id).where(Instrument.ticker == ticker))
-        row = result.first()
-        return str(row.id) if row else None
+    return registry.get_id(ticker)
     
+# Runs on the instrument's sequencer queue, like everything else that touches its book.
+@measured
 async def delete_instrument(ticker: str):
     stmt = delete(Instrument).where(Instrument.ticker == ticker)
     async with session_factory() as session:
         await session.execute(stmt)
         await session.commit()
+    instrument_id = registry.remove(ticker)
+    if instrument_id is not None:
+        # the orders and balances rows went with the instrument: release what its
+        # resting orders held and forget its balances
+        quote_id = registry.get_id(settings.QUOTE_TICKER)
+        released = defaultdict(int)
+        for order in [o for o in engine.orders.values() if o.instrument_id == instrument_id]:
+            key, qty = reservation(order, quote_id)
+            released[key] -= qty
+        ledger.apply({}, released)
+        ledger.drop(instrument_id)
+        engine.reset(instrument_id)
+        recent_trades.remove(instrument_id)
+        feed.reset(ticker)
@@ -0,0 +1,93 @@
+import asyncio
+from datetime import datetime
+
+from src.orders.engine import OrderBook, Fill
+from src.orders.schemas import OrderBookItem
+from src.marketdata.schemas import BookSnapshot, BookUpdate, Trade
+
+
+SUBSCRIBER_BUFFER = 1000
+
+
+class Subscriber:
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue[BookUpdate | Trade | None] = asyncio.Queue(maxsize)
+
+    def push(self, event: BookUpdate | Trade):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A slow consumer is dropped instead of blocking the matcher;
+            # it has to reconnect and start over from a fresh snapshot.
+            self.close()
+
+    def close(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def get(self) -> BookUpdate | Trade | None:
+        return await self.queue.get()
+
+
+class Feed:
+    def __init__(self):
+        self.subscribers: dict[str, set[Subscriber]] = {}
+        self.seqs: dict[str, int] = {}
+
+    def next_seq(self, ticker: str) -> int:
+        seq = self.seqs[ticker] = self.seqs.get(ticker, 0) + 1
+        return seq
+
+    def subscribe(self, ticker: str, book: OrderBook | None) -> tuple[Subscriber, BookSnapshot]:
+        subscriber = Subscriber(SUBSCRIBER_BUFFER)
+        self.subscribers.setdefault(ticker, set()).add(subscriber)
+        snapshot = BookSnapshot(
+            seq=self.seqs.get(ticker, 0),
+            bid_levels=levels(book.bids.depth(len(book.bids.keys))) if book else [],
+            ask_levels=levels(book.asks.depth(len(book.asks.keys))) if book else []
+        )
+        return subscriber, snapshot
+
+    def unsubscribe(self, ticker: str, subscriber: Subscriber):
+        subscribers = self.subscribers.get(ticker)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.subscribers[ticker]
+
+    def publish(self, ticker: str, event: BookUpdate | Trade):
+        for subscriber in self.subscribers.get(ticker, ()):
+            subscriber.push(event)
+
+    def publish_match(self, book: OrderBook, fills: list[Fill], bid_prices: set[int], ask_prices: set[int], timestamp: datetime | None = None):
+        ticker = book.ticker
+        if not fills and not bid_prices and not ask_prices:
+            return
+        if ticker not in self.subscribers:
+            self.seqs[ticker] = self.seqs.get(ticker, 0) + len(fills) + 1
+            return
+        for fill in fills:
+            self.publish(ticker, Trade(seq=self.next_seq(ticker), price=fill.price, amount=fill.qty, timestamp=timestamp))
+        self.publish(ticker, BookUpdate(
+            seq=self.next_seq(ticker),
+            bid_levels=changed(book.bids.levels, bid_prices),
+            ask_levels=changed(book.asks.levels, ask_prices)
+        ))
+
+    def reset(self, ticker: str):
+        for subscriber in self.subscribers.pop(ticker, ()):
+            subscriber.close()
+
+
+def levels(price_levels) -> list[OrderBookItem]:
+    return [OrderBookItem(price=level.price, qty=level.qty) for level in price_levels]
+
+def changed(price_levels: dict, prices: set[int]) -> list[OrderBookItem]:
+    return [
+        OrderBookItem(price=price, qty=price_levels[price].qty if price in price_levels else 0)
+        for price in sorted(prices)
+    ]
+
+
+feed = Feed()
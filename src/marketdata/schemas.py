@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from datetime import datetime
+
+from src.orders.schemas import OrderBookItem
+
+
+class BookSnapshot(BaseModel):
+    seq: int
+    bid_levels: list[OrderBookItem]
+    ask_levels: list[OrderBookItem]
+
+class BookUpdate(BaseModel):
+    seq: int
+    bid_levels: list[OrderBookItem]
+    ask_levels: list[OrderBookItem]
+
+class Trade(BaseModel):
+    seq: int
+    price: int
+    amount: int
+    timestamp: datetime
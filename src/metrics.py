@@ -0,0 +1,143 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import wraps
+from math import inf
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from src.config import settings
+
+
+# Prometheus text exposition, kept in-process: a handful of histograms and gauges
+# do not justify a client library, and the hot path stays a dict lookup, a bisect
+# and two additions per observation.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, inf)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...], buckets: tuple[float, ...] = BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, labels: tuple[str, ...], value: float):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * len(self.buckets), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, (counts, total) in self.series.items():
+            pairs = "".join(f'{label}="{value}",' for label, value in zip(self.labels, values))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{pairs}le="{"+Inf" if bound == inf else bound}"}} {cumulative}')
+            pairs = f"{{{pairs.rstrip(',')}}}" if pairs else ""
+            lines.append(f"{self.name}_sum{pairs} {total}")
+            lines.append(f"{self.name}_count{pairs} {cumulative}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help: str, collect: Callable[[], float] | None = None):
+        self.name = name
+        self.help = help
+        self.value = 0.0
+        self.collect = collect
+
+    def render(self) -> list[str]:
+        value = self.collect() if self.collect else self.value
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+request_duration = Histogram("http_request_duration_seconds", "Request latency by route template", ("method", "route", "status"))
+requests_in_flight = Gauge("http_requests_in_flight", "Requests being served")
+service_duration = Histogram("service_call_duration_seconds", "Service function latency", ("function",))
+statement_duration = Histogram("db_statement_duration_seconds", "Statement execution time by calling service function", ("function", "statement"))
+pool_wait = Histogram("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ())
+metrics = [request_duration, requests_in_flight, service_duration, statement_duration, pool_wait]
+
+# name of the service function the current task is running, for statement tags
+operation: ContextVar[str] = ContextVar("operation", default="other")
+
+
+def measured(fn):
+    if not settings.METRICS_ENABLED:
+        return fn
+    name = fn.__name__
+
+    @wraps(fn)
+    async def wrapper(*args, **kwargs):
+        token = operation.set(name)
+        start = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            service_duration.observe((name,), time.perf_counter() - start)
+            operation.reset(token)
+    return wrapper
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        requests_in_flight.value += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            requests_in_flight.value -= 1
+            # the router leaves the matched route in the scope; label by its template
+            # so /order/{order_id} stays one series
+            route = scope.get("route")
+            request_duration.observe(
+                (scope["method"], route.path if route is not None else "unmatched", str(status)),
+                time.perf_counter() - start
+            )
+
+
+class TimedPool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_wait.observe((), time.perf_counter() - start)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.metrics_start = time.perf_counter()
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context.metrics_start
+    statement_duration.observe((operation.get(), statement.split(None, 1)[0].upper()), elapsed)
+
+def instrument(engine, gauge: str = "db_pool_checked_out"):
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", after_cursor_execute)
+    pool = engine.sync_engine.pool
+    metrics.append(Gauge(gauge, "Connections currently checked out", pool.checkedout))
+
+
+def render() -> str:
+    return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
@@ -11,6 +11,7 @@ from src.instruments.models import Instrument
 from src.balances.models import Balance
 from src.orders.models import Order
 from src.transactions.models import Transaction
+from src.candles.models import Candle
 from src.database import Base
 
 # this is the Alembic Config object, which provides
@@ -0,0 +1,39 @@
+"""candles
+
+Revision ID: 3f8a1c6d2b70
+Revises: 9d41a6c2e8b5
+Create Date: 2026-10-18 15:02:47.530114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f8a1c6d2b70'
+down_revision: Union[str, None] = '9d41a6c2e8b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('candles',
+    sa.Column('instrument_id', sa.Uuid(), nullable=False),
+    sa.Column('period', sa.Integer(), nullable=False),
+    sa.Column('start', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('open', sa.Integer(), nullable=False),
+    sa.Column('high', sa.Integer(), nullable=False),
+    sa.Column('low', sa.Integer(), nullable=False),
+    sa.Column('close', sa.Integer(), nullable=False),
+    sa.Column('volume', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['instrument_id'], ['instruments.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('instrument_id', 'period', 'start')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('candles')
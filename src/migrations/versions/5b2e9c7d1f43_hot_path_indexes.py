@@ -0,0 +1,54 @@
+"""hot_path_indexes
+
+Revision ID: 5b2e9c7d1f43
+Revises: a8346de9bf32
+Create Date: 2026-10-18 12:10:31.418206
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2e9c7d1f43'
+down_revision: Union[str, None] = 'a8346de9bf32'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY cannot run inside a transaction and keeps the tables writable while building
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_orders_open',
+            'orders',
+            ['instrument_id', 'timestamp'],
+            postgresql_where=sa.text("status IN ('NEW', 'PARTIALLY_EXECUTED') AND price IS NOT NULL"),
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+        op.create_index(
+            'ix_orders_user_timestamp',
+            'orders',
+            ['user_id', 'timestamp'],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+        op.create_index(
+            'ix_transactions_instrument_timestamp',
+            'transactions',
+            ['instrument_id', 'timestamp'],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_transactions_instrument_timestamp', table_name='transactions', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_orders_user_timestamp', table_name='orders', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_orders_open', table_name='orders', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,120 @@
+"""native_timestamps
+
+Revision ID: 9d41a6c2e8b5
+Revises: 5b2e9c7d1f43
+Create Date: 2026-10-18 13:02:54.730118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d41a6c2e8b5'
+down_revision: Union[str, None] = '5b2e9c7d1f43'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 10000
+LOCK_TIMEOUT = '5s'
+
+INDEXES = {
+    'orders': {
+        'ix_orders_open': "(instrument_id, timestamp_tz, seq) WHERE status IN ('NEW', 'PARTIALLY_EXECUTED') AND price IS NOT NULL",
+        'ix_orders_user_timestamp': "(user_id, timestamp_tz, seq)",
+    },
+    'transactions': {
+        'ix_transactions_instrument_timestamp': "(instrument_id, timestamp_tz, seq)",
+    },
+}
+
+
+def transaction(*statements: str) -> None:
+    # short explicit transactions inside the autocommit block; lock_timeout makes
+    # the migration fail fast instead of queueing writers behind a blocked ALTER
+    op.execute('BEGIN')
+    op.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+    for statement in statements:
+        op.execute(statement)
+    op.execute('COMMIT')
+
+
+def backfill(table: str) -> None:
+    bind = op.get_bind()
+    while True:
+        result = bind.execute(sa.text(f"""
+            UPDATE {table} SET timestamp_tz = batch.timestamp::timestamptz, seq = batch.seq
+            FROM (
+                SELECT id, timestamp, nextval('{table}_seq') AS seq
+                FROM (
+                    SELECT id, timestamp FROM {table}
+                    WHERE seq IS NULL
+                    ORDER BY timestamp, id
+                    LIMIT :batch_size
+                ) ordered
+            ) batch
+            WHERE {table}.id = batch.id
+        """), {'batch_size': BATCH_SIZE})
+        if result.rowcount < BATCH_SIZE:
+            break
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        for table, indexes in INDEXES.items():
+            # new nullable columns and a column default are catalog-only changes
+            transaction(
+                f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS timestamp_tz TIMESTAMP WITH TIME ZONE',
+                f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS seq BIGINT',
+                f'ALTER TABLE {table} ALTER COLUMN timestamp_tz SET DEFAULT now()',
+                f'CREATE SEQUENCE IF NOT EXISTS {table}_seq OWNED BY {table}.seq',
+            )
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_seq_backfill ON {table} (timestamp, id) WHERE seq IS NULL')
+            backfill(table)
+            # rows written by the old code while the backfill ran are picked up
+            # here, after which every new row gets a seq from the default
+            transaction(
+                f"ALTER TABLE {table} ALTER COLUMN seq SET DEFAULT nextval('{table}_seq')",
+                f"""UPDATE {table} SET timestamp_tz = coalesce(timestamp_tz, timestamp::timestamptz), seq = nextval('{table}_seq')
+                    WHERE seq IS NULL""",
+            )
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS ix_{table}_seq_backfill')
+
+            # VALIDATE scans without blocking writes; SET NOT NULL then reuses the
+            # validated constraint instead of scanning under an exclusive lock
+            transaction(
+                f'ALTER TABLE {table} ADD CONSTRAINT {table}_timestamp_seq_not_null '
+                f'CHECK (timestamp_tz IS NOT NULL AND seq IS NOT NULL) NOT VALID',
+            )
+            op.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT {table}_timestamp_seq_not_null')
+            for name, definition in indexes.items():
+                op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name}_tz ON {table} {definition}')
+
+            transaction(
+                f'ALTER TABLE {table} ALTER COLUMN timestamp_tz SET NOT NULL',
+                f'ALTER TABLE {table} ALTER COLUMN seq SET NOT NULL',
+                f'ALTER TABLE {table} DROP CONSTRAINT {table}_timestamp_seq_not_null',
+                f'ALTER TABLE {table} DROP COLUMN timestamp',
+                f'ALTER TABLE {table} RENAME COLUMN timestamp_tz TO timestamp',
+                *(f'ALTER INDEX {name}_tz RENAME TO {name}' for name in indexes),
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, indexes in INDEXES.items():
+        for name in indexes:
+            op.drop_index(name, table_name=table)
+        op.alter_column(table, 'timestamp', type_=sa.String(), server_default=None, postgresql_using='timestamp::text')
+        op.drop_column(table, 'seq')
+    op.create_index(
+        'ix_orders_open',
+        'orders',
+        ['instrument_id', 'timestamp'],
+        postgresql_where=sa.text("status IN ('NEW', 'PARTIALLY_EXECUTED') AND price IS NOT NULL")
+    )
+    op.create_index('ix_orders_user_timestamp', 'orders', ['user_id', 'timestamp'])
+    op.create_index('ix_transactions_instrument_timestamp', 'transactions', ['instrument_id', 'timestamp'])
@@ -0,0 +1,228 @@
+from bisect import bisect_left, insort
+from collections import deque
+from datetime import datetime
+
+from src.orders.models import Direction
+
+
+class RestingOrder:
+    __slots__ = ("id", "user_id", "instrument_id", "direction", "price", "qty", "filled", "timestamp")
+
+    def __init__(
+        self,
+        id: str,
+        user_id: str,
+        instrument_id: str,
+        direction: Direction,
+        price: int,
+        qty: int,
+        filled: int = 0,
+        timestamp: datetime | None = None
+    ):
+        self.id = id
+        self.user_id = user_id
+        self.instrument_id = instrument_id
+        self.direction = direction
+        self.price = price
+        self.qty = qty
+        self.filled = filled
+        self.timestamp = timestamp
+
+    @property
+    def remaining(self) -> int:
+        return self.qty - self.filled
+
+
+class Fill:
+    __slots__ = ("maker", "qty", "price")
+
+    def __init__(self, maker: RestingOrder, qty: int, price: int):
+        self.maker = maker
+        self.qty = qty
+        self.price = price
+
+
+class PriceLevel:
+    __slots__ = ("price", "qty", "orders")
+
+    def __init__(self, price: int):
+        self.price = price
+        self.qty = 0
+        self.orders: deque[RestingOrder] = deque()
+
+
+class BookSide:
+    # Level keys are kept sorted ascending with the best price last: bids are keyed
+    # by price, asks by -price, so the best level is always keys[-1].
+    __slots__ = ("sign", "levels", "keys")
+
+    def __init__(self, sign: int):
+        self.sign = sign
+        self.levels: dict[int, PriceLevel] = {}
+        self.keys: list[int] = []
+
+    def best(self) -> PriceLevel | None:
+        return self.levels[self.sign * self.keys[-1]] if self.keys else None
+
+    def crosses(self, price: int | None) -> bool:
+        return bool(self.keys) and (price is None or self.keys[-1] >= self.sign * price)
+
+    def add(self, order: RestingOrder):
+        level = self.levels.get(order.price)
+        if level is None:
+            level = self.levels[order.price] = PriceLevel(order.price)
+            insort(self.keys, self.sign * order.price)
+        level.orders.append(order)
+        level.qty += order.remaining
+
+    def remove(self, order: RestingOrder):
+        level = self.levels[order.price]
+        level.orders.remove(order)
+        level.qty -= order.remaining
+        if not level.orders:
+            self.drop_level(order.price)
+
+    def drop_level(self, price: int):
+        del self.levels[price]
+        key = self.sign * price
+        if self.keys[-1] == key:
+            self.keys.pop()
+        else:
+            del self.keys[bisect_left(self.keys, key)]
+
+    def depth(self, limit: int) -> list[PriceLevel]:
+        if limit <= 0:
+            return []
+        return [self.levels[self.sign * key] for key in reversed(self.keys[-limit:])]
+
+
+class OrderBook:
+    def __init__(self, instrument_id: str, ticker: str):
+        self.instrument_id = instrument_id
+        self.ticker = ticker
+        self.bids = BookSide(1)
+        self.asks = BookSide(-1)
+
+    def side(self, direction: Direction) -> BookSide:
+        return self.bids if direction == Direction.BUY else self.asks
+
+    def opposite(self, direction: Direction) -> BookSide:
+        return self.asks if direction == Direction.BUY else self.bids
+
+    def cost(self, direction: Direction, qty: int) -> int:
+        # quote amount a market order of qty would pay or receive right now
+        side = self.opposite(direction)
+        total = 0
+        for key in reversed(side.keys):
+            level = side.levels[side.sign * key]
+            take = min(qty, level.qty)
+            total += take * level.price
+            qty -= take
+            if not qty:
+                break
+        return total
+
+    def match(self, direction: Direction, qty: int, price: int | None) -> list[Fill]:
+        side = self.opposite(direction)
+        fills = []
+        while qty and side.crosses(price):
+            level = side.best()
+            while qty and level.orders:
+                maker = level.orders[0]
+                fill_qty = min(qty, maker.remaining)
+                maker.filled += fill_qty
+                level.qty -= fill_qty
+                qty -= fill_qty
+                fills.append(Fill(maker, fill_qty, level.price))
+                if not maker.remaining:
+                    level.orders.popleft()
+            if not level.orders:
+                side.drop_level(level.price)
+        return fills
+
+
+class MatchingEngine:
+    def __init__(self):
+        self.books: dict[str, OrderBook] = {}
+        self.tickers: dict[str, OrderBook] = {}
+        self.orders: dict[str, RestingOrder] = {}
+        self.users: dict[str, dict[str, RestingOrder]] = {}
+        # instruments whose book was dropped after a failed write and has not been
+        # reloaded from the database yet; nothing may trade on them until it is
+        self.stale: set[str] = set()
+
+    def book(self, instrument_id: str, ticker: str | None = None) -> OrderBook:
+        book = self.books.get(instrument_id)
+        if book is None:
+            book = self.books[instrument_id] = OrderBook(instrument_id, ticker)
+            if ticker is not None:
+                self.tickers[ticker] = book
+        return book
+
+    def ticker_of(self, order_id: str) -> str | None:
+        order = self.orders.get(order_id)
+        return self.books[order.instrument_id].ticker if order else None
+
+    def rest(self, order: RestingOrder):
+        self.book(order.instrument_id).side(order.direction).add(order)
+        self.orders[order.id] = order
+        self.users.setdefault(order.user_id, {})[order.id] = order
+
+    def forget(self, order: RestingOrder):
+        del self.orders[order.id]
+        user_orders = self.users[order.user_id]
+        del user_orders[order.id]
+        if not user_orders:
+            del self.users[order.user_id]
+
+    def submit(self, order: RestingOrder) -> list[Fill]:
+        fills = self.book(order.instrument_id).match(order.direction, order.remaining, order.price)
+        for fill in fills:
+            order.filled += fill.qty
+            if not fill.maker.remaining:
+                self.forget(fill.maker)
+        if order.price is not None and order.remaining:
+            self.rest(order)
+        return fills
+
+    def resize(self, order: RestingOrder, qty: int):
+        # shrinks a resting order in place, keeping its place in the queue
+        self.book(order.instrument_id).side(order.direction).levels[order.price].qty -= order.qty - qty
+        order.qty = qty
+
+    def cancel(self, order_id: str) -> RestingOrder | None:
+        order = self.orders.get(order_id)
+        if order is not None:
+            self.forget(order)
+            self.book(order.instrument_id).side(order.direction).remove(order)
+        return order
+
+    def cancel_all(self, orders: list[RestingOrder]):
+        # one pass over every touched level instead of a deque scan per order
+        levels: dict[tuple[BookSide, int], set[str]] = {}
+        for order in orders:
+            self.forget(order)
+            side = self.book(order.instrument_id).side(order.direction)
+            levels.setdefault((side, order.price), set()).add(order.id)
+        for (side, price), ids in levels.items():
+            level = side.levels[price]
+            level.orders = deque(o for o in level.orders if o.id not in ids)
+            level.qty = sum(o.remaining for o in level.orders)
+            if not level.orders:
+                side.drop_level(price)
+
+    def reset(self, instrument_id: str | None = None):
+        if instrument_id is None:
+            self.books.clear()
+            self.tickers.clear()
+            self.orders.clear()
+            self.users.clear()
+            return
+        book = self.books.pop(instrument_id, None)
+        if book is not None:
+            self.tickers.pop(book.ticker, None)
+        for order in [o for o in self.orders.values() if o.instrument_id == instrument_id]:
+            self.forget(order)
+
+
+engine = MatchingEngine()
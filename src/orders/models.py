@@ -1,9 +1,8 @@
-from sqlalchemy import ForeignKey
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Index, Sequence, func, text
 from sqlalchemy.orm import Mapped, mapped_column
 from uuid import UUID
 from enum import Enum
 from datetime import datetime
-from pytz import UTC
 
 from src.database import Base
 
@@ -26,7 +25,19 @@ class Order(Base):
     instrument_id: Mapped[UUID] = mapped_column(ForeignKey('instruments.id', ondelete='CASCADE'), nullable=False)
     status: Mapped[Status] = mapped_column(default=Status.NEW)
     direction: Mapped[Direction]
-    timestamp: Mapped[str] = mapped_column(default=str(datetime.now(UTC)))
+    timestamp: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    seq: Mapped[int] = mapped_column(BigInteger, Sequence("orders_seq"), server_default=text("nextval('orders_seq')"))
     price: Mapped[int | None] = mapped_column(default=None, nullable=True)
     qty: Mapped[int] = mapped_column(nullable=False)
     filled: Mapped[int | None] = mapped_column(default=None, nullable=True)
+
+    __table_args__ = (
+        Index(
+            'ix_orders_open',
+            'instrument_id',
+            'timestamp',
+            'seq',
+            postgresql_where=text("status IN ('NEW', 'PARTIALLY_EXECUTED') AND price IS NOT NULL")
+        ),
+        Index('ix_orders_user_timestamp', 'user_id', 'timestamp', 'seq'),
+    )
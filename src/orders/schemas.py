@@ -1,4 +1,5 @@
 from pydantic import BaseModel, Field
+from datetime import datetime
 
 from src.orders.models import Direction, Status
 
@@ -14,11 +15,15 @@ class MarketOrderBody(BaseModel):
     qty: int = Field(ge=1)
     ticker: str
 
+class AmendOrderBody(BaseModel):
+    qty: int | None = Field(default=None, ge=1)
+    price: int | None = Field(default=None, gt=0)
+
 class LimitOrder(BaseModel):
     id: str
     status: Status
     user_id: str
-    timestamp: str
+    timestamp: datetime
     body: LimitOrderBody
     filled: int
 
@@ -26,7 +31,7 @@ class MarketOrder(BaseModel):
     id: str
     status: Status
     user_id: str
-    timestamp: str
+    timestamp: datetime
     body: MarketOrderBody
 
 class OrderBookItem(BaseModel):
@@ -36,3 +41,8 @@ class OrderBookItem(BaseModel):
 class OrderBook(BaseModel):
     bid_levels: list[OrderBookItem]
     ask_levels: list[OrderBookItem]
+
+class BatchOrderResult(BaseModel):
+    success: bool
+    order_id: str | None = None
+    detail: str | None = None
@@ -0,0 +1,80 @@
+import asyncio
+import time
+from contextvars import ContextVar, Context, Token, copy_context
+from typing import Any, Awaitable, Callable
+
+# perf_counter() at which the job being run was submitted, for queue-wait spans
+queued_at: ContextVar[float | None] = ContextVar("queued_at", default=None)
+
+
+class Sequencer:
+    # One queue and one consumer task per ticker: jobs for the same ticker run
+    # strictly one after another, jobs for different tickers run concurrently.
+    def __init__(self):
+        self.queues: dict[str, asyncio.Queue] = {}
+        self.workers: dict[str, asyncio.Task] = {}
+        # when set, jobs run with the context variables of the request that
+        # submitted them instead of the worker's (see src/profiler.py)
+        self.propagate = False
+
+    async def submit(self, key: str, fn: Callable[..., Awaitable[Any]], *args) -> Any:
+        queue = self.queues.get(key)
+        if queue is None:
+            queue = self.queues[key] = asyncio.Queue()
+            # a fresh context: the worker outlives the request that happened to start it
+            self.workers[key] = asyncio.create_task(self.run(queue), context=Context())
+        future = asyncio.get_running_loop().create_future()
+        context = copy_context() if self.propagate else None
+        queue.put_nowait((future, fn, args, time.perf_counter(), context))
+        return await future
+
+    async def run(self, queue: asyncio.Queue):
+        while True:
+            future, fn, args, submitted, context = await queue.get()
+            tokens = []
+            try:
+                if future.cancelled():
+                    continue
+                if context is not None:
+                    tokens = self.enter(context)
+                tokens.append(queued_at.set(submitted))
+                result = await fn(*args)
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                # back to the worker's own values, so nothing of one submitter
+                # carries over into the next job
+                for token in reversed(tokens):
+                    token.var.reset(token)
+                queue.task_done()
+
+    @staticmethod
+    def enter(context: Context) -> list[Token]:
+        return [var.set(value) for var, value in context.items()]
+
+    def depths(self) -> dict[str, int]:
+        return {key: queue.qsize() for key, queue in self.queues.items()}
+
+    async def close(self, key: str):
+        # stops the worker of key once its queued jobs have run; the caller makes
+        # sure no new ones arrive, e.g. by removing the instrument first
+        queue = self.queues.get(key)
+        if queue is None:
+            return
+        await queue.join()
+        if self.queues.get(key) is queue:
+            del self.queues[key]
+            self.workers.pop(key).cancel()
+
+    async def stop(self):
+        for worker in self.workers.values():
+            worker.cancel()
+        await asyncio.gather(*self.workers.values(), return_exceptions=True)
+        self.queues.clear()
+        self.workers.clear()
+
+
+sequencer = Sequencer()
@@ -1,103 +1,413 @@
+import logging
+from collections import defaultdict
 from uuid import uuid4
-from sqlalchemy import insert, update, select, desc
+from datetime import datetime
+from pytz import UTC
+from sqlalchemy import insert, update, select, desc, tuple_, values, column, case, cast, Integer, Uuid
 from sqlalchemy.sql import or_
 from fastapi import HTTPException
 
+from src.config import settings
 from src.database import session_factory
+from src.metrics import measured
+from src.tracing import traced, span
+from src.pagination import encode_cursor, decode_cursor, as_utc
 from src.orders.models import Order, Status, Direction
+from src.orders.engine import engine, RestingOrder, Fill, OrderBook as Book
 from src.instruments.models import Instrument
+from src.instruments.registry import registry
 from src.transactions.models import Transaction
-from src.orders.schemas import LimitOrderBody, MarketOrderBody, MarketOrder, LimitOrder, OrderBookItem, OrderBook
-
-
-# async def create_order(user_id: str, order: LimitOrderBody | MarketOrderBody) -> str:
-#     query = select(Instrument.id).where(Instrument.ticker == order.ticker)
-#     async with session_factory() as session:
-#         query_result = await session.execute(query)
-#         instrument_id = query_result.one().id
-#         stmt = insert(Order).values(
-#             id=uuid4(),
-#             user_id=user_id,
-#             instrument_id=instrument_id,
-#             direction=order.direction,
-#             qty=order.qty,
-#             price=(None if isinstance(order, MarketOrderBody) else order.price),
-#             filled=(None if isinstance(order, MarketOrderBody) else 0)
-#         ).returning(Instrument.id)
-#         stmt_result = await session.execute(stmt)
-#         order_id = stmt_result.one().id
-#         await session.commit()
-#         return order_id
+from src.transactions.recent import recent_trades
+from src.marketdata.feed import feed
+from src.candles.service import update_candles
+from src.balances.ledger import ledger, reservation, settle, partition, merge
+from src.balances.service import apply_deltas
+from src.orders.schemas import LimitOrderBody, MarketOrderBody, MarketOrder, LimitOrder, OrderBookItem, OrderBook, BatchOrderResult, AmendOrderBody
 
-async def create_order(user_id: str, order: LimitOrderBody | MarketOrderBody) -> str:
+
+# asyncpg caps a statement at 32767 bind parameters
+FILLS_CHUNK = 5000
+
+logger = logging.getLogger(__name__)
+
+
+async def load_books(instrument_id: str | None = None):
+    query = select(
+        Order.id,
+        Order.user_id,
+        Order.instrument_id,
+        Order.direction,
+        Order.price,
+        Order.qty,
+        Order.filled,
+        Order.timestamp
+    ).where(
+        Order.price != None,
+        Order.status.in_([Status.NEW, Status.PARTIALLY_EXECUTED])
+    ).order_by(
+        Order.timestamp,
+        Order.seq
+    )
+    if instrument_id is not None:
+        query = query.where(Order.instrument_id == instrument_id)
     async with session_factory() as session:
-        query = select(Instrument.id).where(Instrument.ticker == order.ticker)
-        instrument_id = (await session.execute(query)).one().id
-        order_id = uuid4()
-        stmt = insert(Order).values(
-            id=order_id,
-            user_id=user_id,
-            instrument_id=instrument_id,
-            direction=order.direction,
-            qty=order.qty,
-            price=(None if isinstance(order, MarketOrderBody) else order.price),
-            filled=(None if isinstance(order, MarketOrderBody) else 0)
-        ).returning(Order.id)
-        await session.execute(stmt)
-            
-        opposite_dir = Direction.SELL if order.direction == Direction.BUY else Direction.BUY
-        price_condition = (Order.price <= order.price if isinstance(order, LimitOrderBody) and order.direction == Direction.BUY 
-            else Order.price >= order.price if isinstance(order, LimitOrderBody) else True)
-        match_query = select(Order).where(
-            Order.instrument_id == instrument_id,
-            Order.direction == opposite_dir,
-            Order.status.in_([Status.NEW, Status.PARTIALLY_EXECUTED]),
-            price_condition
-        ).with_for_update()
-        matches = (await session.execute(match_query)).all()
-            
-        qty_left = order.qty
-        for match in sorted(matches, key=lambda x: (x.price, x.timestamp)):
-            if qty_left <= 0:
-                break
-            fill_qty = min(qty_left, match.qty - (match.filled or 0))
-            if fill_qty > 0:
-                await session.execute(
-                    update(Order).where(Order.id == match.id).values(
-                        filled=(match.filled or 0) + fill_qty,
-                        status=Status.EXECUTED if (match.filled or 0) + fill_qty == match.qty else Status.PARTIALLY_EXECUTED
-                    )
-                )
-                await session.execute(
-                    insert(Transaction).values(
-                        id=uuid4(),
-                        instrument_id=instrument_id,
-                        amount=fill_qty,
-                        price=match.price
-                    )
-                )
-                qty_left -= fill_qty
-            
-        new_status = Status.EXECUTED if qty_left == 0 else Status.PARTIALLY_EXECUTED if qty_left < order.qty else Status.NEW
+        rows = (await session.execute(query)).all()
+    engine.reset(instrument_id)
+    for row in rows:
+        engine.book(str(row.instrument_id), registry.get_ticker(str(row.instrument_id)))
+        engine.rest(RestingOrder(
+            id=str(row.id),
+            user_id=str(row.user_id),
+            instrument_id=str(row.instrument_id),
+            direction=row.direction,
+            price=row.price,
+            qty=row.qty,
+            filled=row.filled or 0,
+            timestamp=row.timestamp
+        ))
+    if instrument_id is None:
+        engine.stale.clear()
+    else:
+        engine.stale.discard(instrument_id)
+
+async def recover(book: Book):
+    # the book holds changes that never reached the database: drop it first, so
+    # a failed reload cannot leave them behind, and fence the instrument off
+    # until a reload succeeds
+    engine.reset(book.instrument_id)
+    engine.stale.add(book.instrument_id)
+    feed.reset(book.ticker)
+    try:
+        await load_books(book.instrument_id)
+    except Exception:
+        # not raised: the caller re-raises the failed write, which is what the
+        # client should see; the instrument stays stale and ensure_loaded retries
+        # on its next order
+        logger.exception("reloading %s after a failed write failed", book.ticker)
+
+async def ensure_loaded(instrument_id: str):
+    if instrument_id not in engine.stale:
+        return
+    try:
+        await load_books(instrument_id)
+    except Exception:
+        raise HTTPException(status_code=503, detail="Order book unavailable")
+
+async def persist_fills(session, instrument_id: str, fills: list[Fill], timestamp: datetime) -> list[int]:
+    seqs = []
+    for i in range(0, len(fills), FILLS_CHUNK):
+        chunk = fills[i:i + FILLS_CHUNK]
+        ids = [uuid4() for _ in chunk]
+        result = await session.execute(insert(Transaction).values([
+            {"id": id, "instrument_id": instrument_id, "amount": fill.qty, "price": fill.price, "timestamp": timestamp}
+            for id, fill in zip(ids, chunk)
+        ]).returning(Transaction.id, Transaction.seq))
+        seq = dict(result.all())
+        seqs.extend(seq[id] for id in ids)
+        makers = values(
+            column("id", Uuid),
+            column("filled", Integer),
+            name="makers"
+        ).data([(fill.maker.id, fill.maker.filled) for fill in chunk])
         await session.execute(
-            update(Order).where(Order.id == order_id).values(
-                filled=order.qty - qty_left if isinstance(order, LimitOrderBody) else None,
-                status=new_status
-            )
+            update(Order).where(Order.id == makers.c.id).values(
+                filled=makers.c.filled,
+                status=cast(
+                    case((makers.c.filled == Order.qty, Status.EXECUTED.value), else_=Status.PARTIALLY_EXECUTED.value),
+                    Order.status.type
+                )
+            ).execution_options(synchronize_session=False)
         )
-        await session.commit()
-        return str(order_id)
+    return seqs
+
+def order_row(taker: RestingOrder) -> dict:
+    return {
+        "id": taker.id,
+        "user_id": taker.user_id,
+        "instrument_id": taker.instrument_id,
+        "direction": taker.direction,
+        "timestamp": taker.timestamp,
+        "qty": taker.qty,
+        "price": taker.price,
+        "filled": (None if taker.price is None else taker.filled),
+        "status": (Status.EXECUTED if not taker.remaining else Status.PARTIALLY_EXECUTED if taker.filled else Status.NEW)
+    }
+
+def resolve(ticker: str) -> tuple[str, str]:
+    instrument_id = registry.get_id(ticker)
+    quote_id = registry.get_id(settings.QUOTE_TICKER)
+    if not instrument_id or not quote_id or instrument_id == quote_id:
+        raise HTTPException(status_code=400, detail="Instrument not exists")
+    return instrument_id, quote_id
+
+def match_order(
+    user_id: str,
+    quote_id: str,
+    book: Book,
+    order: LimitOrderBody | MarketOrderBody,
+    timestamp: datetime
+) -> tuple[RestingOrder, list[Fill], tuple, tuple]:
+    instrument_id = book.instrument_id
+    if order.direction == Direction.SELL:
+        funded = ledger.available(user_id, instrument_id) >= order.qty
+    elif isinstance(order, MarketOrderBody):
+        funded = ledger.available(user_id, quote_id) >= book.cost(order.direction, order.qty)
+    else:
+        funded = ledger.available(user_id, quote_id) >= order.price * order.qty
+    if not funded:
+        raise HTTPException(status_code=400, detail="Insufficient balance")
+    taker = RestingOrder(
+        id=str(uuid4()),
+        user_id=user_id,
+        instrument_id=instrument_id,
+        direction=order.direction,
+        price=(None if isinstance(order, MarketOrderBody) else order.price),
+        qty=order.qty,
+        timestamp=timestamp
+    )
+    fills = engine.submit(taker)
+    # what the match takes is applied before the first await so concurrent orders
+    # of the same user on other tickers see the funds as spent; persist_matches
+    # applies what it frees once the write commits
+    taken, freed = partition(*settle(taker, fills, quote_id))
+    ledger.apply(*taken)
+    return taker, fills, taken, freed
+
+async def persist_matches(
+    book: Book,
+    stmt,
+    matches: list[tuple[RestingOrder, list[Fill]]],
+    taken: tuple,
+    freed: tuple,
+    timestamp: datetime,
+    touched: tuple[set[int], set[int]] = (set(), set())
+):
+    # stmt writes the takers themselves; touched are extra bid and ask prices
+    # whose levels changed and have to be published
+    fills = [fill for _, taker_fills in matches for fill in taker_fills]
+    amounts = defaultdict(int)
+    for deltas in (taken[0], freed[0]):
+        for key, delta in deltas.items():
+            amounts[key] += delta
+    try:
+        async with session_factory() as session:
+            with span("checkout"):
+                await session.connection()
+            with span("write orders", orders=len(matches)):
+                await session.execute(stmt)
+            with span("write fills", fills=len(fills)):
+                seqs = await persist_fills(session, book.instrument_id, fills, timestamp)
+            with span("candles"):
+                await update_candles(session, book.instrument_id, fills, timestamp)
+            with span("balances", rows=len(amounts)):
+                await apply_deltas(session, amounts)
+            with span("commit"):
+                await session.commit()
+    except Exception:
+        with span("rollback"):
+            ledger.apply(*taken, -1)
+            await recover(book)
+        raise
+    ledger.apply(*freed)
+    with span("publish"):
+        if fills:
+            recent_trades.push(book.instrument_id, [(fill.price, fill.qty, timestamp, seq) for fill, seq in zip(fills, seqs)])
+        bid_prices, ask_prices = set(touched[0]), set(touched[1])
+        for taker, taker_fills in matches:
+            resting, makers = (bid_prices, ask_prices) if taker.direction == Direction.BUY else (ask_prices, bid_prices)
+            if taker.id in engine.orders:
+                resting.add(taker.price)
+            makers.update(fill.price for fill in taker_fills)
+        feed.publish_match(book, fills, bid_prices, ask_prices, timestamp)
 
+# create_order, create_orders, amend_order, cancel_order and cancel_orders mutate
+# the in-memory book and must run on the instrument's sequencer queue (see
+# src/orders/sequencer.py).
+@measured
+@traced
+async def create_order(user_id: str, order: LimitOrderBody | MarketOrderBody) -> str:
+    instrument_id, quote_id = resolve(order.ticker)
+    await ensure_loaded(instrument_id)
+    book = engine.book(instrument_id, order.ticker)
+    timestamp = datetime.now(UTC)
+    with span("match"):
+        taker, fills, taken, freed = match_order(user_id, quote_id, book, order, timestamp)
+    stmt = insert(Order).values(order_row(taker))
+    await persist_matches(book, stmt, [(taker, fills)], taken, freed, timestamp)
+    return taker.id
+
+@measured
+@traced
+async def create_orders(user_id: str, ticker: str, orders: list[LimitOrderBody | MarketOrderBody]) -> list[BatchOrderResult]:
+    # Matched one by one in submission order; the accepted ones are committed together.
+    instrument_id, quote_id = resolve(ticker)
+    await ensure_loaded(instrument_id)
+    book = engine.book(instrument_id, ticker)
+    timestamp = datetime.now(UTC)
+    results = []
+    matches = []
+    taken = (defaultdict(int), defaultdict(int))
+    freed = (defaultdict(int), defaultdict(int))
+    with span("match", orders=len(orders)):
+        for order in orders:
+            try:
+                taker, fills, taker_taken, taker_freed = match_order(user_id, quote_id, book, order, timestamp)
+            except HTTPException as e:
+                results.append(BatchOrderResult(success=False, detail=e.detail))
+                continue
+            matches.append((taker, fills))
+            merge(taken, taker_taken)
+            merge(freed, taker_freed)
+            results.append(BatchOrderResult(success=True, order_id=taker.id))
+    if matches:
+        stmt = insert(Order).values([order_row(taker) for taker, _ in matches])
+        await persist_matches(book, stmt, matches, taken, freed, timestamp)
+    return results
+
+@measured
+@traced
+async def amend_order(user_id: str, order_id: str, amend: AmendOrderBody):
+    # A smaller qty at the same price keeps the order's place in the queue; any
+    # other change re-queues it at the back and may match like a new order.
+    if amend.qty is None and amend.price is None:
+        raise HTTPException(status_code=400, detail="Nothing to amend")
+    order = engine.orders.get(order_id)
+    if order is None or order.user_id != user_id:
+        raise HTTPException(status_code=404)
+    qty = order.qty if amend.qty is None else amend.qty
+    price = order.price if amend.price is None else amend.price
+    if qty <= order.filled:
+        raise HTTPException(status_code=400, detail="Quantity must exceed the filled amount")
+    book = engine.books[order.instrument_id]
+    quote_id = registry.get_id(settings.QUOTE_TICKER)
+    key, held = reservation(order, quote_id)
+    needed = (qty - order.filled) * (price if order.direction == Direction.BUY else 1)
+    if needed > held and ledger.available(*key) < needed - held:
+        raise HTTPException(status_code=400, detail="Insufficient balance")
+    timestamp = datetime.now(UTC)
+    old_price = order.price
+    with span("match"):
+        if price == order.price and qty <= order.qty:
+            engine.resize(order, qty)
+            fills = []
+            amounts, reserved = {}, {key: needed - held}
+        else:
+            engine.cancel(order.id)
+            order.price, order.qty, order.timestamp = price, qty, timestamp
+            fills = engine.submit(order)
+            amounts, reserved = settle(order, fills, quote_id)
+            reserved[key] -= held
+        taken, freed = partition(amounts, reserved)
+        ledger.apply(*taken)
+    row = order_row(order)
+    stmt = update(Order).where(Order.id == order.id).values(
+        price=row["price"],
+        qty=row["qty"],
+        filled=row["filled"],
+        status=row["status"],
+        timestamp=order.timestamp
+    )
+    touched = ({old_price}, set()) if order.direction == Direction.BUY else (set(), {old_price})
+    await persist_matches(book, stmt, [(order, fills)], taken, freed, timestamp, touched)
+
+@measured
+@traced
 async def cancel_order(user_id: str, order_id: str):
     stmt = update(Order).where(
         Order.id == order_id,
         Order.user_id == user_id,
         or_(Order.status == Status.NEW, Order.status == Status.PARTIALLY_EXECUTED)
     ).values(status=Status.CANCELLED)
-    async with session_factory() as session:
-        await session.execute(stmt)
-        await session.commit()
+    resting = engine.orders.get(order_id)
+    book = engine.book(resting.instrument_id) if resting is not None and resting.user_id == user_id else None
+    if resting is None and engine.stale:
+        # it may rest in a book that is waiting for a reload, and cancelling it
+        # only in the database would leave its reservation held
+        async with session_factory() as session:
+            instrument_id = await session.scalar(select(Order.instrument_id).where(Order.id == order_id))
+        if instrument_id is not None and str(instrument_id) in engine.stale:
+            raise HTTPException(status_code=503, detail="Order book unavailable")
+    released = {}
+    if book is not None:
+        with span("cancel"):
+            engine.cancel(order_id)
+            key, qty = reservation(resting, registry.get_id(settings.QUOTE_TICKER))
+            released = {key: -qty}
+    try:
+        async with session_factory() as session:
+            with span("checkout"):
+                await session.connection()
+            with span("write orders"):
+                await session.execute(stmt)
+            with span("commit"):
+                await session.commit()
+    except Exception:
+        if book is not None:
+            with span("rollback"):
+                await recover(book)
+        raise
+    # released only once the cancel commits, so a failed write has nothing to take back
+    ledger.apply({}, released)
+    if book is not None:
+        with span("publish"):
+            prices = {resting.price}
+            if resting.direction == Direction.BUY:
+                feed.publish_match(book, [], prices, set())
+            else:
+                feed.publish_match(book, [], set(), prices)
 
+@measured
+@traced
+async def cancel_orders(user_id: str, ticker: str, direction: Direction | None = None) -> list[str]:
+    instrument_id = registry.get_id(ticker)
+    if instrument_id is None:
+        return []
+    await ensure_loaded(instrument_id)
+    book = engine.tickers.get(ticker)
+    if book is None:
+        return []
+    orders = [
+        o for o in engine.users.get(user_id, {}).values()
+        if o.instrument_id == instrument_id and (direction is None or o.direction == direction)
+    ]
+    if not orders:
+        return []
+    with span("cancel", orders=len(orders)):
+        engine.cancel_all(orders)
+        quote_id = registry.get_id(settings.QUOTE_TICKER)
+        released = defaultdict(int)
+        for order in orders:
+            key, qty = reservation(order, quote_id)
+            released[key] -= qty
+    ids = [order.id for order in orders]
+    try:
+        async with session_factory() as session:
+            with span("checkout"):
+                await session.connection()
+            with span("write orders"):
+                await session.execute(
+                    update(Order).where(
+                        Order.id.in_(ids),
+                        or_(Order.status == Status.NEW, Order.status == Status.PARTIALLY_EXECUTED)
+                    ).values(status=Status.CANCELLED)
+                )
+            with span("commit"):
+                await session.commit()
+    except Exception:
+        with span("rollback"):
+            await recover(book)
+        raise
+    ledger.apply({}, released)
+    with span("publish"):
+        feed.publish_match(
+            book,
+            [],
+            {o.price for o in orders if o.direction == Direction.BUY},
+            {o.price for o in orders if o.direction == Direction.SELL}
+        )
+    return ids
+
+@measured
 async def get_order(id: str, user_id: str) -> MarketOrder | LimitOrder:
     query = select(
         Order.id,
@@ -124,9 +434,9 @@ async def get_order(id: str, user_id: str) -> MarketOrder | LimitOrder:
         if not order:
             raise HTTPException(status_code=404)
         return MarketOrder(
-            id=order.id,
+            id=str(order.id),
             status = order.status,
-            user_id=order.user_id,
+            user_id=str(order.user_id),
             timestamp=order.timestamp,
             body=MarketOrderBody(
                 direction=order.direction,
@@ -134,9 +444,9 @@ async def get_order(id: str, user_id: str) -> MarketOrder | LimitOrder:
                 ticker=order.ticker
             )
         ) if not order.price else LimitOrder(
-            id=order.id,
+            id=str(order.id),
             status = order.status,
-            user_id=order.user_id,
+            user_id=str(order.user_id),
             timestamp=order.timestamp,
             filled=order.filled,
             body=LimitOrderBody(
@@ -147,96 +457,120 @@ async def get_order(id: str, user_id: str) -> MarketOrder | LimitOrder:
             )
         )
 
-async def get_orders(user_id: str) -> list[MarketOrder | LimitOrder]:
+@measured
+async def get_orders(
+    user_id: str,
+    limit: int,
+    open: bool = False,
+    status: list[Status] | None = None,
+    ticker: str | None = None,
+    direction: Direction | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    before: str | None = None
+) -> tuple[list[MarketOrder | LimitOrder], str | None]:
+    instrument_id = None
+    if ticker is not None:
+        instrument_id = registry.get_id(ticker)
+        if instrument_id is None:
+            return [], None
+    since, until = as_utc(since), as_utc(until)
+
+    if open and before is None:
+        resting = [
+            o for o in engine.users.get(user_id, {}).values()
+            if (instrument_id is None or o.instrument_id == instrument_id)
+            and (direction is None or o.direction == direction)
+            and (not status or (Status.PARTIALLY_EXECUTED if o.filled else Status.NEW) in status)
+            and (since is None or o.timestamp >= since)
+            and (until is None or o.timestamp < until)
+        ]
+        # a page that needs a cursor comes from the indexed query below
+        if len(resting) <= limit:
+            resting.sort(key=lambda o: o.timestamp, reverse=True)
+            return [
+                LimitOrder(
+                    id=o.id,
+                    status=Status.PARTIALLY_EXECUTED if o.filled else Status.NEW,
+                    user_id=o.user_id,
+                    timestamp=o.timestamp,
+                    filled=o.filled,
+                    body=LimitOrderBody(
+                        direction=o.direction,
+                        qty=o.qty,
+                        ticker=registry.get_ticker(o.instrument_id),
+                        price=o.price
+                    )
+                ) for o in resting
+            ], None
+
     query = select(
         Order.id,
         Order.status,
         Order.user_id,
+        Order.instrument_id,
         Order.timestamp,
+        Order.seq,
         Order.direction,
-        Instrument.ticker,
         Order.price,
         Order.qty,
         Order.filled
-    ).select_from(
-        Order
-    ).join(
-        Instrument,
-        Instrument.id == Order.instrument_id
     ).where(
         Order.user_id == user_id
-    )
+    ).order_by(
+        desc(Order.timestamp),
+        desc(Order.seq)
+    ).limit(limit)
+    if open:
+        query = query.where(Order.price != None, Order.status.in_([Status.NEW, Status.PARTIALLY_EXECUTED]))
+    if status:
+        query = query.where(Order.status.in_(status))
+    if instrument_id is not None:
+        query = query.where(Order.instrument_id == instrument_id)
+    if direction is not None:
+        query = query.where(Order.direction == direction)
+    if since:
+        query = query.where(Order.timestamp >= since)
+    if until:
+        query = query.where(Order.timestamp < until)
+    if before:
+        query = query.where(tuple_(Order.timestamp, Order.seq) < decode_cursor(before))
+
     async with session_factory() as session:
         result = await session.execute(query)
         orders = result.all()
-        return [
-            MarketOrder(
-                id=order.id,
-                status = order.status,
-                user_id=order.user_id,
-                timestamp=order.timestamp,
-                body=MarketOrderBody(
-                    direction=order.direction,
-                    qty=order.qty,
-                    ticker=order.ticker
-                )
-            ) if not order.price else LimitOrder(
-                id=order.id,
-                status = order.status,
-                user_id=order.user_id,
-                timestamp=order.timestamp,
-                filled=order.filled,
-                body=LimitOrderBody(
-                    direction=order.direction,
-                    qty=order.qty,
-                    ticker=order.ticker,
-                    price=order.price
-                )
-            ) for order in orders
-        ]
+    return [
+        MarketOrder(
+            id=str(order.id),
+            status = order.status,
+            user_id=str(order.user_id),
+            timestamp=order.timestamp,
+            body=MarketOrderBody(
+                direction=order.direction,
+                qty=order.qty,
+                ticker=registry.get_ticker(str(order.instrument_id))
+            )
+        ) if not order.price else LimitOrder(
+            id=str(order.id),
+            status = order.status,
+            user_id=str(order.user_id),
+            timestamp=order.timestamp,
+            filled=order.filled,
+            body=LimitOrderBody(
+                direction=order.direction,
+                qty=order.qty,
+                ticker=registry.get_ticker(str(order.instrument_id)),
+                price=order.price
+            )
+        ) for order in orders
+    ], encode_cursor(orders[-1].timestamp, orders[-1].seq) if orders else None
 
-async def get_orderbook(ticker: str, limit: int):
-    bid_query = select(
-        Order.price,
-        Order.qty,
-        Order.filled
-    ).select_from(
-        Order
-    ).join(
-        Instrument,
-        Instrument.id == Order.instrument_id
-    ).where(
-        Instrument.ticker == ticker,
-        Order.price != None,
-        Order.direction == Direction.BUY,
-        or_(Order.status == Status.NEW, Order.status == Status.PARTIALLY_EXECUTED)
-    ).order_by(
-        desc(Order.price)
-    ).limit(
-        limit
-    )
-    ask_query = select(
-        Order.price,
-        Order.qty,
-        Order.filled
-    ).select_from(
-        Order
-    ).join(
-        Instrument,
-        Instrument.id == Order.instrument_id
-    ).where(
-        Instrument.ticker == ticker,
-        Order.price != None,
-        Order.direction == Direction.SELL,
-        or_(Order.status == Status.NEW, Order.status == Status.PARTIALLY_EXECUTED)
-    ).order_by(
-        Order.price
-    ).limit(
-        limit
+@measured
+async def get_orderbook(ticker: str, limit: int) -> OrderBook:
+    book = engine.tickers.get(ticker)
+    if book is None:
+        return OrderBook(bid_levels=[], ask_levels=[])
+    return OrderBook(
+        bid_levels=[OrderBookItem(price=level.price, qty=level.qty) for level in book.bids.depth(limit)],
+        ask_levels=[OrderBookItem(price=level.price, qty=level.qty) for level in book.asks.depth(limit)]
     )
-    async with session_factory() as session:
-        bid_result = await session.execute(bid_query)
-        ask_result = await session.execute(ask_query)
-        bid_levels = [OrderBookItem(price=bl.price, qty=(bl.qty-bl.filled)) for bl in bid_result.all()]
-        ask_levels = [OrderBookItem(price=al.price, qty=(al.qty-al.filled)) for al in ask_result.all()]
-        return OrderBook(bid_levels=bid_levels, ask_levels=ask_levels)
@@ -0,0 +1,21 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from fastapi import HTTPException
+from pytz import UTC
+
+
+def encode_cursor(timestamp: datetime, seq: int) -> str:
+    return urlsafe_b64encode(f"{timestamp.isoformat()}|{seq}".encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        timestamp, seq = urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(seq)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def as_utc(timestamp: datetime | None) -> datetime | None:
+    # naive since/until bounds are taken as UTC, like the stored timestamps
+    if timestamp is not None and timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=UTC)
+    return timestamp
@@ -0,0 +1,198 @@
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from urllib.parse import parse_qsl
+
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from src.config import settings
+from src.orders.sequencer import Sequencer, sequencer
+from src.users.auth import authenticate
+from src.users.schemas import Role
+
+
+# Opt-in (PROFILE_ENABLED): every request is sampled while it is in flight, and
+# the profile is kept only if the request took PROFILE_THRESHOLD seconds or an
+# admin sent the X-Debug-Profile header. A sampler thread reads the event loop
+# thread's stack every PROFILE_INTERVAL seconds and charges the sample to the
+# request whose coroutine is on it; statement time comes from the engine hooks.
+HEADER = b"x-debug-profile"
+ASYNC = inspect.CO_COROUTINE | inspect.CO_ASYNC_GENERATOR
+
+
+class Profile:
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.start = time.perf_counter()
+        self.stacks: Counter[str] = Counter()
+        self.other = 0
+        self.idle = 0
+        self.db = 0.0
+        self.statements = 0
+
+    def dump(self, trigger: str, status: int, wall: float) -> dict:
+        route = self.scope.get("route")
+        interval = settings.PROFILE_INTERVAL
+        return {
+            "timestamp": datetime.now().astimezone().isoformat(),
+            "trigger": trigger,
+            "method": self.scope["method"],
+            "route": route.path if route is not None else None,
+            "path": self.scope["path"],
+            "path_params": self.scope.get("path_params", {}),
+            "query": dict(parse_qsl(self.scope["query_string"].decode())),
+            "status": status,
+            "wall_ms": wall * 1000,
+            # statement time awaited on the database, exact
+            "db_ms": self.db * 1000,
+            "statements": self.statements,
+            # sampled: the loop running this request's Python code, someone else's,
+            # or waiting for I/O
+            "cpu_ms": sum(self.stacks.values()) * interval * 1000,
+            "other_ms": self.other * interval * 1000,
+            "idle_ms": self.idle * interval * 1000,
+            "interval_ms": interval * 1000,
+            # folded stacks, outermost frame first, as flamegraph.pl and speedscope read them
+            "stacks": dict(self.stacks.most_common())
+        }
+
+
+active: ContextVar[Profile | None] = ContextVar("profile", default=None)
+
+
+class Sampler:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.profiles: set[Profile] = set()
+        self.wake = threading.Event()
+        self.thread: threading.Thread | None = None
+        self.loop_thread: int | None = None
+        self.markers = {ProfilerMiddleware.__call__.__code__: "profile", Sequencer.run.__code__: "context"}
+
+    def add(self, profile: Profile):
+        if self.thread is None:
+            self.loop_thread = threading.get_ident()
+            self.thread = threading.Thread(target=self.run, name="profiler", daemon=True)
+            self.thread.start()
+        self.profiles.add(profile)
+        self.wake.set()
+
+    def remove(self, profile: Profile):
+        self.profiles.discard(profile)
+
+    def run(self):
+        while True:
+            self.wake.wait()
+            time.sleep(self.interval)
+            if not self.profiles:
+                self.wake.clear()
+                # a request may have started between the check and the clear
+                if self.profiles:
+                    self.wake.set()
+                continue
+            self.sample()
+
+    def sample(self):
+        frame = sys._current_frames().get(self.loop_thread)
+        owner = None
+        stack = []
+        depth = 0
+        while frame is not None:
+            code = frame.f_code
+            local = self.markers.get(code)
+            if owner is None and local is not None:
+                value = frame.f_locals.get(local)
+                # jobs on the sequencer carry the submitting request's context
+                owner = value.get(active) if local == "context" and value is not None else value
+            stack.append(f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            if code.co_flags & ASYNC:
+                depth = len(stack)
+            frame = frame.f_back
+        # everything outside the outermost coroutine is event loop machinery
+        stack = stack[:depth]
+        for profile in tuple(self.profiles):
+            if profile is owner:
+                profile.stacks[";".join(reversed(stack))] += 1
+            elif stack:
+                profile.other += 1
+            else:
+                # no coroutine on the stack: the loop is waiting for I/O
+                profile.idle += 1
+
+
+class ProfilerMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        profile = Profile(scope)
+        token = active.set(profile)
+        sampler.add(profile)
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            sampler.remove(profile)
+            active.reset(token)
+            wall = time.perf_counter() - profile.start
+            if wall >= settings.PROFILE_THRESHOLD:
+                save(profile.dump("threshold", status, wall))
+            elif await requested_by_admin(scope):
+                save(profile.dump("header", status, wall))
+
+
+async def requested_by_admin(scope: dict) -> bool:
+    headers = dict(scope["headers"])
+    authorization = headers.get(b"authorization", b"").decode()
+    if HEADER not in headers or not authorization.startswith("TOKEN "):
+        return False
+    try:
+        user = await authenticate(authorization.replace("TOKEN ", ""))
+    except HTTPException:
+        return False
+    return user.role == Role.ADMIN
+
+def save(profile: dict):
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    route = (profile["route"] or profile["path"]).strip("/").replace("/", "_").replace("{", "").replace("}", "")
+    name = f"{time.time_ns()}-{profile['method']}-{route}.json"
+    with open(os.path.join(settings.PROFILE_DIR, name), "w") as f:
+        json.dump(profile, f, indent=2)
+    # file names start with the time, so the oldest sort first
+    dumps = sorted(n for n in os.listdir(settings.PROFILE_DIR) if n.endswith(".json"))
+    for old in dumps[:-settings.PROFILE_KEEP]:
+        os.remove(os.path.join(settings.PROFILE_DIR, old))
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.profile_start = time.perf_counter()
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = active.get()
+    if profile is not None:
+        profile.db += time.perf_counter() - context.profile_start
+        profile.statements += 1
+
+def install(engine):
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", after_cursor_execute)
+    sequencer.propagate = True
+
+
+sampler = Sampler(settings.PROFILE_INTERVAL)
@@ -0,0 +1,73 @@
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.database import engine, read_engine, session_factory, read_session_factory
+
+
+# Seconds the replica is behind. A standby that has replayed everything it
+# received counts as current even if the primary has been idle since; a server
+# that is not in recovery (no replica configured, or pointed at a primary) has
+# no lag. Right after an idle spell the first unreplayed write is measured from
+# the last replayed one, which overstates the lag: that errs towards the primary.
+LAG = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+
+class Replica:
+    def __init__(self, max_lag: float, interval: float):
+        self.max_lag = max_lag
+        self.interval = interval
+        # None until measured, or while the replica cannot be reached
+        self.lag: float | None = None
+        self.task: asyncio.Task | None = None
+
+    @property
+    def configured(self) -> bool:
+        return read_engine is not engine
+
+    @property
+    def fresh(self) -> bool:
+        return self.configured and self.lag is not None and self.lag <= self.max_lag
+
+    def session(self) -> AsyncSession:
+        # reads fall back to the primary while the replica is behind or down
+        return read_session_factory() if self.fresh else session_factory()
+
+    async def check(self):
+        try:
+            async with asyncio.timeout(self.interval + self.max_lag):
+                async with read_engine.connect() as conn:
+                    lag = (await conn.execute(LAG)).scalar()
+            self.lag = None if lag is None else float(lag)
+        except Exception:
+            self.lag = None
+
+    async def monitor(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+    async def start(self):
+        if self.configured:
+            await self.check()
+            self.task = asyncio.create_task(self.monitor())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    def stats(self) -> dict:
+        return {"configured": self.configured, "lag": self.lag, "fresh": self.fresh}
+
+
+replica = Replica(settings.REPLICA_MAX_LAG, settings.REPLICA_CHECK_INTERVAL)
@@ -1,13 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
-from fastapi.security import APIKeyHeader
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic import BaseModel
 
-from src.users.service import is_user_admin, delete_user
-from src.users.schemas import UserModel
+from src.users.auth import get_admin, auth_cache
+from src.users.service import delete_user
+from src.users.schemas import UserModel, AuthUser
 from src.instruments.service import create_instrument, delete_instrument, get_instrument_id
 from src.instruments.schemas import CreateInstrument
 from src.balances.service import deposit, withdraw
-from src.balances.schemas import Balance
+from src.balances.schemas import Balance, BulkResult
+from src.balances.bulk import ingest
+from src.orders.sequencer import sequencer
+from src.slowlog import slowlog
+from src.replica import replica
 
 
 class Result(BaseModel):
@@ -17,64 +21,67 @@ class Result(BaseModel):
 admin_router = APIRouter(prefix="/admin", tags=["admin"])
 
 
-async def get_authorization(authorization: str | None = Header(default=None, alias="Authorization")):
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Api-key is empty")
-    return authorization
-
-
 @admin_router.post("/instrument", response_model=Result)
-async def add_instrument(instrument: CreateInstrument, authorization: str = Depends(get_authorization)):
-    await check_admin(authorization)
+async def add_instrument(instrument: CreateInstrument, _: AuthUser = Depends(get_admin)):
     await create_instrument(instrument)
 
     return Result(success=True)
 
 @admin_router.delete("/user/{user_id}", response_model=UserModel, tags=["user"])
-async def user_delete(user_id: str, authorization: str | None = Depends(get_authorization)):
-    await check_admin(authorization)
+async def user_delete(user_id: str, _: AuthUser = Depends(get_admin)):
     return await delete_user(user_id)
 
 @admin_router.delete("/instrument/{ticker}", response_model=Result)
-async def instrument_delete(ticker: str, authorization: str | None = Depends(get_authorization)):
-    await check_admin(authorization)
-    await delete_instrument(ticker)
+async def instrument_delete(ticker: str, _: AuthUser = Depends(get_admin)):
+    await sequencer.submit(ticker, delete_instrument, ticker)
+    await sequencer.close(ticker)
     return Result(success=True)
 
 @admin_router.post("/balance/deposit", response_model=Result, tags=["balance"])
-async def balance_deposit(balance: Balance, authorization: str | None = Depends(get_authorization)):
-    await check_admin(authorization)
+async def balance_deposit(balance: Balance, _: AuthUser = Depends(get_admin)):
     instrument_id = await get_instrument_id(balance.ticker)
     if not instrument_id:
         raise HTTPException(status_code=400, detail="Instrument not exists")
     await deposit(
-        user_id=balance.user_id, 
+        user_id=str(balance.user_id),
         instrument_id=instrument_id,
         amount=balance.amount
     )
     return Result(success=True)
 
 @admin_router.post("/balance/withdraw", response_model=Result, tags=["balance"])
-async def balance_withdraw(balance: Balance, authorization: str | None = Depends(get_authorization)):
-    await check_admin(authorization)
+async def balance_withdraw(balance: Balance, _: AuthUser = Depends(get_admin)):
     instrument_id = await get_instrument_id(balance.ticker)
     if not instrument_id:
         raise HTTPException(status_code=400, detail="Instrument not exists")
     await withdraw(
-        user_id=balance.user_id, 
+        user_id=str(balance.user_id),
         instrument_id=instrument_id,
         amount=balance.amount
     )
     return Result(success=True)
 
-async def check_admin(authorization: str | None):
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Api-key is empty")
-    
-    if not authorization.startswith("TOKEN "):
-        raise HTTPException(status_code=401, detail=f"Incorrect api-key: {authorization}")
-    
-    token = authorization.replace("TOKEN ", "")
-    admin = await is_user_admin(token)
-    if not admin:
-        raise HTTPException(status_code=403, detail=f"User is not admin")
+@admin_router.post("/balance/bulk", response_model=BulkResult, tags=["balance"])
+async def balance_bulk(request: Request, _: AuthUser = Depends(get_admin)):
+    # CSV or NDJSON rows of (user_id, ticker, amount); negative amounts withdraw
+    content_type = request.headers.get("content-type", "")
+    ndjson = "ndjson" in content_type or "jsonl" in content_type
+    return await ingest(request.stream(), ndjson)
+
+@admin_router.get("/stats")
+async def stats(_: AuthUser = Depends(get_admin)):
+    return {
+        "sequencer": sequencer.depths(),
+        "auth_cache": auth_cache.stats(),
+        "replica": replica.stats()
+    }
+
+@admin_router.get("/slow-queries")
+async def slow_queries(limit: int = Query(default=50, ge=1, le=1000), _: AuthUser = Depends(get_admin)):
+    # statements over SLOW_QUERY_THRESHOLD, by total time spent; empty when the log is off
+    return slowlog.report(limit)
+
+@admin_router.delete("/slow-queries", response_model=Result)
+async def clear_slow_queries(_: AuthUser = Depends(get_admin)):
+    slowlog.clear()
+    return Result(success=True)
@@ -1,24 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
-from fastapi.security import APIKeyHeader
+from fastapi import APIRouter, Depends
 
 from src.balances.service import get_all
-from src.users.service import get_user_id
+from src.users.auth import get_current_user
+from src.users.schemas import AuthUser
 
 balance_router = APIRouter(prefix="/balance", tags=["balance"])
 
-async def get_authorization(authorization: str | None = Header(default=None, alias="Authorization")):
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Api-key is empty")
-    return authorization
-
 @balance_router.get("", response_model=dict[str, int])
-async def get_balances(authorization: str | None = Depends(get_authorization)):
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Api-key is empty")
-    
-    if not authorization.startswith("TOKEN "):
-        raise HTTPException(status_code=401, detail=f"Incorrect api-key: {authorization}")
-    
-    token = authorization.replace("TOKEN ", "")
-    id = await get_user_id(token)
-    return await get_all(id)
\ No newline at end of file
+async def get_balances(user: AuthUser = Depends(get_current_user)):
+    return await get_all(user.id)
@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from src.metrics import render
+
+metrics_router = APIRouter(tags=["metrics"])
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
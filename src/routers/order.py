@@ -1,53 +1,119 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
-from fastapi.security import APIKeyHeader
+import asyncio
+import logging
+from datetime import datetime
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response
 from pydantic import BaseModel
 
-from src.orders.service import create_order, get_orders, get_order, cancel_order
-from src.orders.schemas import MarketOrderBody, LimitOrderBody, LimitOrder, MarketOrder
-from src.users.service import get_user_id
+from src.orders.service import resolve, create_order, create_orders, amend_order, get_orders, get_order, cancel_order, cancel_orders
+from src.orders.engine import engine
+from src.orders.sequencer import sequencer
+from src.orders.models import Direction, Status
+from src.orders.schemas import MarketOrderBody, LimitOrderBody, LimitOrder, MarketOrder, BatchOrderResult, AmendOrderBody
+from src.instruments.registry import registry
+from src.users.auth import get_current_user
+from src.users.schemas import AuthUser
 
 order_router = APIRouter(prefix="/order", tags=["order"])
+logger = logging.getLogger(__name__)
 
 class CreateOrderResult(BaseModel):
     success: bool
     order_id: str
 
+class AmendOrderResult(BaseModel):
+    success: bool
+
 class CancelOrderResult(BaseModel):
     success: bool
 
-async def get_authorization(authorization: str | None = Header(default=None, alias="Authorization")):
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Api-key is empty")
-    return authorization
+class CancelOrdersResult(BaseModel):
+    success: bool
+    order_ids: list[str]
+    # tickers whose cancel failed; their orders stay open
+    failed: list[str] = []
 
 @order_router.post("", response_model=CreateOrderResult)
-async def create(order: MarketOrderBody | LimitOrderBody, authorization: str | None = Depends(get_authorization)):
-    user_id = await parse_user_id(authorization)
-    order_id = await create_order(user_id, order)
+async def create(order: MarketOrderBody | LimitOrderBody, user: AuthUser = Depends(get_current_user)):
+    # checked before queueing, so unknown tickers do not get a queue of their own
+    resolve(order.ticker)
+    order_id = await sequencer.submit(order.ticker, create_order, user.id, order)
     return CreateOrderResult(success=True, order_id=order_id)
 
+@order_router.post("/batch", response_model=list[BatchOrderResult])
+async def create_batch(
+    orders: list[MarketOrderBody | LimitOrderBody] = Body(min_length=1, max_length=1000),
+    user: AuthUser = Depends(get_current_user)
+):
+    tickers = {order.ticker for order in orders}
+    if len(tickers) != 1:
+        raise HTTPException(status_code=400, detail="All orders in a batch must have the same ticker")
+    ticker = tickers.pop()
+    resolve(ticker)
+    return await sequencer.submit(ticker, create_orders, user.id, ticker, orders)
+
 @order_router.get("", response_model=list[MarketOrder | LimitOrder])
-async def get_all(authorization: str | None = Depends(get_authorization)):
-    user_id = await parse_user_id(authorization)
-    return await get_orders(user_id)
+async def get_all(
+    response: Response,
+    limit: int = Query(default=100, ge=1, le=1000),
+    open: bool = False,
+    status: list[Status] | None = Query(default=None),
+    ticker: str | None = None,
+    direction: Direction | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    before: str | None = None,
+    user: AuthUser = Depends(get_current_user)
+):
+    orders, next_cursor = await get_orders(user.id, limit, open, status, ticker, direction, since, until, before)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return orders
+
+@order_router.delete("", response_model=CancelOrdersResult)
+async def cancel_all(
+    ticker: str | None = None,
+    direction: Direction | None = None,
+    user: AuthUser = Depends(get_current_user)
+):
+    if ticker is None:
+        tickers = {engine.books[o.instrument_id].ticker for o in engine.users.get(user.id, {}).values()}
+    elif registry.get_id(ticker) is None:
+        raise HTTPException(status_code=400, detail="Instrument not exists")
+    else:
+        tickers = {ticker}
+    # One transaction per ticker, each on its own sequencer: a ticker that fails
+    # keeps its orders and is reported, the others stay cancelled.
+    tickers = sorted(tickers)
+    results = await asyncio.gather(*(
+        sequencer.submit(t, cancel_orders, user.id, t, direction) for t in tickers
+    ), return_exceptions=True)
+    order_ids, failed = [], []
+    for t, result in zip(tickers, results):
+        if isinstance(result, BaseException):
+            if not isinstance(result, HTTPException):
+                logger.error("mass cancel failed for %s", t, exc_info=result)
+            failed.append(t)
+        else:
+            order_ids.extend(result)
+    return CancelOrdersResult(success=not failed, order_ids=order_ids, failed=failed)
 
 @order_router.get("/{order_id}", response_model=MarketOrder | LimitOrder)
-async def get(order_id: str, authorization: str | None = Depends(get_authorization)):
-    user_id = await parse_user_id(authorization)
-    return await get_order(order_id, user_id)
+async def get(order_id: str, user: AuthUser = Depends(get_current_user)):
+    return await get_order(order_id, user.id)
 
 @order_router.delete("/{order_id}", response_model=CancelOrderResult)
-async def get(order_id: str, authorization: str | None = Depends(get_authorization)):
-    user_id = await parse_user_id(authorization)
-    await cancel_order(user_id, order_id)
+async def get(order_id: str, user: AuthUser = Depends(get_current_user)):
+    ticker = engine.ticker_of(order_id)
+    if ticker is None:
+        await cancel_order(user.id, order_id)
+    else:
+        await sequencer.submit(ticker, cancel_order, user.id, order_id)
     return CancelOrderResult(success=True)
 
-async def parse_user_id(authorization: str | None) -> str:
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Api-key is empty")
-    
-    if not authorization.startswith("TOKEN "):
-        raise HTTPException(status_code=401, detail=f"Incorrect api-key: {authorization}")
-    
-    token = authorization.replace("TOKEN ", "")
-    return await get_user_id(token)
\ No newline at end of file
+@order_router.patch("/{order_id}", response_model=AmendOrderResult)
+async def amend(order_id: str, body: AmendOrderBody, user: AuthUser = Depends(get_current_user)):
+    ticker = engine.ticker_of(order_id)
+    if ticker is None:
+        raise HTTPException(status_code=404)
+    await sequencer.submit(ticker, amend_order, user.id, order_id, body)
+    return AmendOrderResult(success=True)
@@ -1,9 +1,16 @@
-from fastapi import APIRouter
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 
 from src.users.service import UserModel, UserCreate, create_user
 from src.instruments.service import InstrumentModel, get_instruments
 from src.orders.service import OrderBook, get_orderbook
 from src.transactions.service import TransactionHistrory, get_history
+from src.candles.service import CandleModel, Interval, get_candles
+from src.orders.engine import engine
+from src.instruments.registry import registry
+from src.marketdata.feed import feed
+from src.marketdata.schemas import Trade
 
 public_router = APIRouter(prefix="/public", tags=["public"])
 
@@ -20,5 +27,44 @@ async def get_order_book(ticker: str, limit: int = 10):
     return await get_orderbook(ticker, limit)
 
 @public_router.get("/transactions/{ticker}", response_model=list[TransactionHistrory])
-async def get_transactions(ticker: str, limit: int = 10):
-    return await get_history(ticker, limit)
\ No newline at end of file
+async def get_transactions(
+    ticker: str,
+    response: Response,
+    limit: int = Query(default=10, ge=1, le=1000),
+    before: str | None = None,
+    after: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None
+):
+    page = await get_history(ticker, limit, before, after, since, until)
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+        response.headers["X-Prev-Cursor"] = page.prev_cursor
+    return page.items
+
+@public_router.get("/candles/{ticker}", response_model=list[CandleModel])
+async def get_candles_history(
+    ticker: str,
+    interval: Interval = Interval.M1,
+    limit: int = Query(default=500, ge=1, le=5000),
+    since: datetime | None = None,
+    until: datetime | None = None
+):
+    return await get_candles(ticker, interval, limit, since, until)
+
+@public_router.get("/stream/{ticker}")
+async def stream(ticker: str):
+    # checked up front: a subscriber to a ticker that never trades would hang forever
+    if registry.get_id(ticker) is None:
+        raise HTTPException(status_code=404, detail="Instrument not exists")
+    async def events():
+        subscriber, snapshot = feed.subscribe(ticker, engine.tickers.get(ticker))
+        try:
+            yield f"event: snapshot\ndata: {snapshot.model_dump_json()}\n\n"
+            while (event := await subscriber.get()) is not None:
+                yield f"event: {'trade' if isinstance(event, Trade) else 'book'}\ndata: {event.model_dump_json()}\n\n"
+            yield "event: overflow\ndata: {}\n\n"
+        finally:
+            feed.unsubscribe(ticker, subscriber)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
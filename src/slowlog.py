@@ -0,0 +1,186 @@
+import asyncio
+import json
+import re
+import time
+from collections import Counter, deque
+from contextvars import Context
+from datetime import datetime
+
+from pytz import UTC
+from sqlalchemy import event
+
+from src.config import settings
+
+
+# Statements slower than SLOW_QUERY_THRESHOLD are aggregated by their normalized
+# text: literals and placeholders become ?, VALUES lists keep their first row and
+# IN lists collapse, so a 3-fill and a 300-fill insert land on the same entry.
+# For each entry the plan is captured on a separate connection, at most once per
+# SLOW_QUERY_EXPLAIN_EVERY seconds and one EXPLAIN at a time. Only SELECTs are
+# run with ANALYZE; writes get the plain plan, since ANALYZE would execute them.
+PARAM = re.compile(r"\$\d+|%\(\w+\)s|%s|'(?:[^']|'')*'|\b\d+\b")
+VALUES = re.compile(r"\bVALUES\s*(?=\()", re.IGNORECASE)
+NEXT_ROW = re.compile(r"\s*,\s*(?=\()")
+IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+SPACE = re.compile(r"\s+")
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+def group_end(statement: str, start: int) -> int:
+    # index just past the parenthesized group opening at start
+    depth = 0
+    for i in range(start, len(statement)):
+        if statement[i] == "(":
+            depth += 1
+        elif statement[i] == ")":
+            depth -= 1
+            if not depth:
+                return i + 1
+    return len(statement)
+
+def collapse_values(statement: str) -> str:
+    # keeps only the first row of every VALUES list, so single- and multi-row
+    # writes share an entry (the parameter shape still tells them apart); rows
+    # may hold calls like nextval(...), hence the paren matching
+    parts = []
+    position = 0
+    for match in VALUES.finditer(statement):
+        if match.start() < position:
+            continue
+        end = group_end(statement, match.end())
+        parts.append(statement[position:end])
+        position = end
+        while row := NEXT_ROW.match(statement, position):
+            position = group_end(statement, row.end())
+    parts.append(statement[position:])
+    return "".join(parts)
+
+def normalize(statement: str) -> str:
+    statement = PARAM.sub("?", SPACE.sub(" ", statement.strip()))
+    statement = collapse_values(statement)
+    return IN_LIST.sub("IN (...)", statement)
+
+def shape(parameters, executemany: bool) -> str:
+    rows = parameters if executemany else [parameters]
+    first = rows[0] if rows else ()
+    values = list(first.values() if isinstance(first, dict) else first or ())
+    types = ", ".join(f"{n} {name}" for name, n in Counter(type(v).__name__ for v in values).items())
+    params = f"{len(values)} params" + (f" ({types})" if types else "")
+    return f"{len(rows)} rows of {params}" if executemany else params
+
+
+class SlowQuery:
+    def __init__(self, statement: str):
+        self.statement = statement
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last_seen: datetime | None = None
+        self.shape = ""
+        self.plan = None
+        self.plan_error: str | None = None
+        self.explained_at = 0.0
+        # a few recent plan summaries, to spot a plan flipping as tables grow
+        self.history: deque[dict] = deque(maxlen=10)
+
+    def report(self) -> dict:
+        return {
+            "statement": self.statement,
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "mean_ms": self.total / self.count * 1000,
+            "max_ms": self.max * 1000,
+            "last_seen": self.last_seen,
+            "parameters": self.shape,
+            "plan": self.plan,
+            "plan_error": self.plan_error,
+            "plan_history": list(self.history)
+        }
+
+
+class SlowLog:
+    def __init__(self, threshold: float, explain_every: float):
+        self.threshold = threshold
+        self.explain_every = explain_every
+        self.entries: dict[str, SlowQuery] = {}
+        # sync engine seen by the hooks -> the async engine to EXPLAIN on
+        self.engines = {}
+        self.explaining = False
+        self.tasks: set[asyncio.Task] = set()
+
+    def record(self, engine, statement: str, parameters, executemany: bool, elapsed: float):
+        key = normalize(statement)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = SlowQuery(key)
+        entry.count += 1
+        entry.total += elapsed
+        entry.max = max(entry.max, elapsed)
+        entry.last_seen = datetime.now(UTC)
+        entry.shape = shape(parameters, executemany)
+        now = time.monotonic()
+        if self.explaining or now - entry.explained_at < self.explain_every:
+            return
+        if not statement.lstrip()[:6].upper().startswith(EXPLAINABLE):
+            return
+        self.explaining = True
+        entry.explained_at = now
+        # a fresh context, so the EXPLAIN is not charged to the request that ran
+        # the statement in metrics, traces or profiles
+        task = asyncio.get_running_loop().create_task(
+            self.explain(engine, entry, statement, parameters[0] if executemany else parameters),
+            context=Context()
+        )
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def explain(self, engine, entry: SlowQuery, statement: str, parameters):
+        analyze = statement.lstrip()[:6].upper() == "SELECT"
+        options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+        try:
+            async with engine.connect() as conn:
+                result = await conn.exec_driver_sql(f"EXPLAIN ({options}) {statement}", parameters)
+                plan = result.scalar()
+                await conn.rollback()
+        except Exception as e:
+            entry.plan_error = repr(e)
+        else:
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            entry.plan = plan
+            entry.plan_error = None
+            top = plan[0]
+            entry.history.append({
+                "captured_at": datetime.now(UTC),
+                "analyze": analyze,
+                "node": top["Plan"]["Node Type"],
+                "total_cost": top["Plan"]["Total Cost"],
+                "plan_rows": top["Plan"]["Plan Rows"],
+                "actual_rows": top["Plan"].get("Actual Rows"),
+                "execution_ms": top.get("Execution Time")
+            })
+        finally:
+            self.explaining = False
+
+    def report(self, limit: int) -> list[dict]:
+        entries = sorted(self.entries.values(), key=lambda e: e.total, reverse=True)
+        return [entry.report() for entry in entries[:limit]]
+
+    def clear(self):
+        self.entries.clear()
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.slowlog_start = time.perf_counter()
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context.slowlog_start
+    if elapsed >= slowlog.threshold and not statement.lstrip()[:7].upper().startswith("EXPLAIN"):
+        slowlog.record(slowlog.engines[conn.engine], statement, parameters, executemany, elapsed)
+
+def install(engine):
+    slowlog.engines[engine.sync_engine] = engine
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", after_cursor_execute)
+
+
+slowlog = SlowLog(settings.SLOW_QUERY_THRESHOLD, settings.SLOW_QUERY_EXPLAIN_EVERY)
@@ -0,0 +1,109 @@
+import json
+import os
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from src.config import settings
+from src.orders.sequencer import queued_at
+
+
+# Spans of a sampled call are collected in memory and appended to TRACE_FILE as
+# Chrome trace events when the call returns; the file opens in chrome://tracing
+# or ui.perfetto.dev. Every trace gets its own track, so concurrent calls on
+# different tickers do not interleave.
+class Trace:
+    __slots__ = ("tid", "events")
+
+    def __init__(self, tid: int, name: str):
+        self.tid = tid
+        self.events = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": f"{name} #{tid}"}}]
+
+    def add(self, name: str, start: float, end: float, args: dict | None = None):
+        event = {"name": name, "ph": "X", "pid": os.getpid(), "tid": self.tid, "ts": start * 1e6, "dur": (end - start) * 1e6}
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+
+class Span:
+    __slots__ = ("trace", "name", "args", "start")
+
+    def __init__(self, trace: Trace, name: str, args: dict):
+        self.trace = trace
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.args["error"] = repr(exc)
+        self.trace.add(self.name, self.start, time.perf_counter(), self.args)
+
+
+class NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+class TraceWriter:
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
+        self.traces = 0
+
+    def write(self, trace: Trace):
+        if self.file is None:
+            self.file = open(self.path, "a")
+            # the closing bracket is optional in the Chrome format, so traces can be
+            # appended for as long as the process lives
+            if self.file.tell() == 0:
+                self.file.write("[\n")
+        self.file.write("".join(json.dumps(event) + ",\n" for event in trace.events))
+        self.file.flush()
+
+    def next_tid(self) -> int:
+        self.traces += 1
+        return self.traces
+
+
+NO_SPAN = NoSpan()
+writer = TraceWriter(settings.TRACE_FILE)
+current: ContextVar[Trace | None] = ContextVar("trace", default=None)
+
+
+def span(name: str, **args):
+    trace = current.get()
+    return NO_SPAN if trace is None else Span(trace, name, args)
+
+def traced(fn):
+    if settings.TRACE_SAMPLE_RATE <= 0:
+        return fn
+    name = fn.__name__
+
+    @wraps(fn)
+    async def wrapper(*args, **kwargs):
+        if current.get() is not None or random.random() >= settings.TRACE_SAMPLE_RATE:
+            return await fn(*args, **kwargs)
+        trace = Trace(writer.next_tid(), name)
+        token = current.set(trace)
+        start = time.perf_counter()
+        submitted = queued_at.get()
+        if submitted is not None:
+            trace.add("queue", submitted, start)
+        try:
+            with Span(trace, name, {}):
+                return await fn(*args, **kwargs)
+        finally:
+            current.reset(token)
+            writer.write(trace)
+    return wrapper
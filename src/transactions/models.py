@@ -1,8 +1,7 @@
-from sqlalchemy import ForeignKey
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Index, Sequence, func, text
 from sqlalchemy.orm import Mapped, mapped_column
 from uuid import UUID
 from datetime import datetime
-from pytz import UTC
 
 from src.database import Base
 
@@ -12,5 +11,10 @@ class Transaction(Base):
     id: Mapped[UUID] = mapped_column(primary_key=True)
     instrument_id: Mapped[UUID] = mapped_column(ForeignKey('instruments.id', ondelete='CASCADE'), nullable=False)
     amount: Mapped[int] = mapped_column(default=0, nullable=False)
-    timestamp: Mapped[str] = mapped_column(default=str(datetime.now(UTC)))
+    timestamp: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    seq: Mapped[int] = mapped_column(BigInteger, Sequence("transactions_seq"), server_default=text("nextval('transactions_seq')"))
     price: Mapped[int | None] = mapped_column(default=None, nullable=True)
+
+    __table_args__ = (
+        Index('ix_transactions_instrument_timestamp', 'instrument_id', 'timestamp', 'seq'),
+    )
@@ -0,0 +1,45 @@
+from collections import deque
+from datetime import datetime
+from itertools import islice
+
+from src.config import settings
+
+
+class RecentTrades:
+    # Last `size` trades per instrument as (price, amount, timestamp, seq), oldest
+    # first. A buffer that has never dropped a trade holds the whole history.
+    def __init__(self, size: int):
+        self.size = size
+        self.trades: dict[str, deque[tuple[int, int, datetime, int]]] = {}
+        self.complete: dict[str, bool] = {}
+
+    def prime(self, instrument_id: str, trades: list[tuple[int, int, datetime, int]]):
+        self.trades[instrument_id] = deque(trades, maxlen=self.size)
+        self.complete[instrument_id] = len(trades) < self.size
+
+    def push(self, instrument_id: str, trades: list[tuple[int, int, datetime, int]]):
+        buffer = self.trades.get(instrument_id)
+        if buffer is None:
+            buffer = self.trades[instrument_id] = deque(maxlen=self.size)
+            self.complete[instrument_id] = True
+        buffer.extend(trades)
+        if len(buffer) == self.size:
+            self.complete[instrument_id] = False
+
+    def latest(self, instrument_id: str, limit: int) -> list[tuple[int, int, datetime, int]] | None:
+        # newest first, or None when the buffer cannot answer and the caller has to read the table
+        buffer = self.trades.get(instrument_id)
+        if buffer is None or (limit > len(buffer) and not self.complete[instrument_id]):
+            return None
+        return list(islice(reversed(buffer), limit))
+
+    def remove(self, instrument_id: str):
+        self.trades.pop(instrument_id, None)
+        self.complete.pop(instrument_id, None)
+
+    def clear(self):
+        self.trades.clear()
+        self.complete.clear()
+
+
+recent_trades = RecentTrades(settings.RECENT_TRADES)
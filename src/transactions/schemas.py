@@ -1,7 +1,13 @@
 from pydantic import BaseModel
+from datetime import datetime
 
 class TransactionHistrory(BaseModel):
     ticker: str
     price: int
     amount: int
-    timestamp: str
+    timestamp: datetime
+
+class TransactionPage(BaseModel):
+    items: list[TransactionHistrory]
+    next_cursor: str | None
+    prev_cursor: str | None
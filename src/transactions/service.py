@@ -1,34 +1,104 @@
-from sqlalchemy import desc, select
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import asc, desc, select, tuple_, true
 
 from src.database import session_factory
+from src.metrics import measured
+from src.replica import replica
+from src.pagination import encode_cursor, decode_cursor, as_utc
 from src.transactions.models import Transaction
 from src.instruments.models import Instrument
-from src.transactions.schemas import TransactionHistrory
+from src.instruments.registry import registry
+from src.transactions.recent import recent_trades
+from src.transactions.schemas import TransactionHistrory, TransactionPage
 
 
-async def get_history(ticker: str, limit: int) -> list[TransactionHistrory]:
+async def load_recent_trades():
+    trades = select(
+        Transaction.price,
+        Transaction.amount,
+        Transaction.timestamp,
+        Transaction.seq
+    ).where(
+        Transaction.instrument_id == Instrument.id
+    ).order_by(
+        desc(Transaction.timestamp),
+        desc(Transaction.seq)
+    ).limit(recent_trades.size).lateral()
+    query = select(Instrument.id, trades).join(trades, true())
+    async with session_factory() as session:
+        result = await session.execute(query)
+        rows = result.all()
+    by_instrument = {}
+    for row in rows:
+        by_instrument.setdefault(str(row.id), []).append((row.price, row.amount, row.timestamp, row.seq))
+    recent_trades.clear()
+    for instrument_id in registry.tickers:
+        recent_trades.prime(instrument_id, sorted(by_instrument.get(instrument_id, []), key=lambda t: (t[2], t[3])))
+
+@measured
+async def get_history(
+    ticker: str,
+    limit: int,
+    before: str | None = None,
+    after: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None
+) -> TransactionPage:
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after")
+    instrument_id = registry.get_id(ticker)
+    if instrument_id is None:
+        return TransactionPage(items=[], next_cursor=None, prev_cursor=None)
+    since, until = as_utc(since), as_utc(until)
+
+    if not (before or after or since or until):
+        rows = recent_trades.latest(instrument_id, limit)
+        if rows is not None:
+            return TransactionPage(
+                items=[
+                    TransactionHistrory(ticker=ticker, price=price, amount=amount, timestamp=timestamp)
+                    for price, amount, timestamp, _ in rows
+                ],
+                next_cursor=encode_cursor(rows[-1][2], rows[-1][3]) if rows else None,
+                prev_cursor=encode_cursor(rows[0][2], rows[0][3]) if rows else None
+            )
+
+    order = asc if after else desc
     query = select(
-        Instrument.ticker,
         Transaction.price,
         Transaction.amount,
-        Transaction.timestamp
-    ).select_from(
-        Transaction
-    ).join(
-        Instrument,
-        Instrument.id == Transaction.instrument_id
+        Transaction.timestamp,
+        Transaction.seq
     ).where(
-        Instrument.ticker == ticker
+        Transaction.instrument_id == instrument_id
     ).order_by(
-        desc(Transaction.timestamp)
+        order(Transaction.timestamp),
+        order(Transaction.seq)
     ).limit(limit)
-    async with session_factory() as session:
+    if before:
+        query = query.where(tuple_(Transaction.timestamp, Transaction.seq) < decode_cursor(before))
+    if after:
+        query = query.where(tuple_(Transaction.timestamp, Transaction.seq) > decode_cursor(after))
+    if since:
+        query = query.where(Transaction.timestamp >= since)
+    if until:
+        query = query.where(Transaction.timestamp < until)
+
+    async with replica.session() as session:
         result = await session.execute(query)
-        return [
+        rows = result.all()
+    if after:
+        rows.reverse()
+    return TransactionPage(
+        items=[
             TransactionHistrory(
-                ticker=t.ticker,
+                ticker=ticker,
                 price=t.price,
                 amount=t.amount,
                 timestamp=t.timestamp
-            ) for t in result.all()
-        ]
+            ) for t in rows
+        ],
+        next_cursor=encode_cursor(rows[-1].timestamp, rows[-1].seq) if rows else None,
+        prev_cursor=encode_cursor(rows[0].timestamp, rows[0].seq) if rows else None
+    )
@@ -0,0 +1,81 @@
+from collections import OrderedDict
+from fastapi import Depends, Header, HTTPException
+from sqlalchemy import select, and_
+from hashlib import sha256
+import hmac
+import time
+
+from src.config import settings
+from src.database import session_factory
+from src.metrics import measured
+from src.users.models import User
+from src.users.schemas import AuthUser, Role
+
+
+class AuthCache:
+    def __init__(self, size: int, ttl: float):
+        self.size = size
+        self.ttl = ttl
+        self.entries: OrderedDict[str, tuple[AuthUser, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key_hash: str) -> AuthUser | None:
+        entry = self.entries.get(key_hash)
+        if entry is None or entry[1] < time.monotonic():
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key_hash)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key_hash: str, user: AuthUser):
+        self.entries[key_hash] = (user, time.monotonic() + self.ttl)
+        self.entries.move_to_end(key_hash)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: str):
+        for key_hash in [h for h, (user, _) in self.entries.items() if user.id == user_id]:
+            del self.entries[key_hash]
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
+
+
+auth_cache = AuthCache(settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL)
+
+
+def hash_api_key(api_key: str) -> str:
+    return hmac.new(settings.HASH_KEY.encode(), api_key.encode(), sha256).hexdigest()
+
+@measured
+async def authenticate(api_key: str) -> AuthUser:
+    key_hash = hash_api_key(api_key)
+    user = auth_cache.get(key_hash)
+    if user is not None:
+        return user
+
+    query = select(User.id, User.role, User.is_active).where(and_(User.api_key_hash == key_hash, User.is_active == True))
+    async with session_factory() as session:
+        result = await session.execute(query)
+        entity = result.one_or_none()
+    if not entity:
+        raise HTTPException(status_code=401, detail="Incorrect api-key")
+    user = AuthUser(id=str(entity.id), role=entity.role.value, is_active=entity.is_active)
+    auth_cache.put(key_hash, user)
+    return user
+
+async def get_current_user(authorization: str | None = Header(default=None, alias="Authorization")) -> AuthUser:
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Api-key is empty")
+
+    if not authorization.startswith("TOKEN "):
+        raise HTTPException(status_code=401, detail=f"Incorrect api-key: {authorization}")
+
+    return await authenticate(authorization.replace("TOKEN ", ""))
+
+async def get_admin(user: AuthUser = Depends(get_current_user)) -> AuthUser:
+    if user.role != Role.ADMIN:
+        raise HTTPException(status_code=403, detail="User is not admin")
+    return user
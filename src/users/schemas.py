@@ -13,3 +13,8 @@ class UserModel(BaseModel):
     name: str
     role: Role
     api_key: str
+
+class AuthUser(BaseModel):
+    id: str
+    role: Role
+    is_active: bool
@@ -1,21 +1,21 @@
 from fastapi import HTTPException
 from secrets import token_hex
-from sqlalchemy import insert, select, and_, update
+from sqlalchemy import insert, update
 from uuid import uuid4
-from hashlib import sha256
-import hmac
 
-from src.config import settings
 from src.database import session_factory
+from src.metrics import measured
+from src.users.auth import auth_cache, hash_api_key
 from src.users.models import User
 from src.users.schemas import UserCreate, UserModel, Role
 from src.crypto import fernet
 
 
+@measured
 async def create_user(user: UserCreate) -> UserModel:
     api_key = token_hex(32)
     encoded_api_key = api_key.encode()
-    hash = hmac.new(settings.HASH_KEY.encode(), encoded_api_key, sha256).hexdigest()
+    hash = hash_api_key(api_key)
     encrypted = fernet.encrypt(encoded_api_key).decode()
     
     users = User.__table__
@@ -43,36 +43,16 @@ async def create_user(user: UserCreate) -> UserModel:
             raise HTTPException(status_code=400, detail="User with this name already exists")
         raise e
 
-async def is_user_admin(api_key: str) -> bool:
-    hash = hmac.new(settings.HASH_KEY.encode(), api_key.encode(), sha256).hexdigest()
-    query = select(User.role).where(and_(User.api_key_hash == hash, User.is_active == True))
-
-    async with session_factory() as session:
-        result = await session.execute(query)
-        entity = result.one_or_none()
-        if not entity:
-            raise HTTPException(status_code=401, detail="Incorrect api-key")
-        return str(entity.role) == "Role.ADMIN" # todo: костыль, при сравнении с enum был false
-
-async def get_user_id(api_key: str) -> str:
-    hash = hmac.new(settings.HASH_KEY.encode(), api_key.encode(), sha256).hexdigest()
-    query = select(User.id).where(and_(User.api_key_hash == hash, User.is_active == True))
-
-    async with session_factory() as session:
-        result = await session.execute(query)
-        entity = result.one_or_none()
-        if not entity:
-            raise HTTPException(status_code=401, detail="Incorrect api-key")
-        return str(entity.id)
-
+@measured
 async def delete_user(user_id: str) -> UserModel:
     stmt = update(User).where(User.id == user_id).values(is_active=False).returning(User.id, User.name, User.role, User.encrypted_api_key)
     async with session_factory() as session:
         result = await session.execute(stmt)
-        entity = result.one()
+        entity = result.one_or_none()
         await session.commit()
         if not entity:
             raise HTTPException(status_code=404, detail="user not found")
+        auth_cache.invalidate_user(str(entity.id))
         return UserModel(
             id=str(entity.id),
             name=entity.name,
@@ -0,0 +1,5 @@
+import os
+
+# the service modules read settings on import; the tests never connect anywhere
+for name, value in (("DATABASE_URL", "localhost/test"), ("HASH_KEY", "test"), ("ENCRYPTION_KEY", "test")):
+    os.environ.setdefault(name, value)
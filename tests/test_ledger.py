@@ -0,0 +1,219 @@
+"""Randomized ledger invariants for the order services, without a database.
+
+The sessions and writers of src/orders/service.py are replaced by an in-memory
+store that commits balance deltas only when the session commits, yields to the
+event loop between statements so tickers interleave like they do against
+Postgres, and fails a share of the commits. Orders, batches, amends and cancels
+on several tickers run concurrently through a sequencer; after every step no
+balance may be negative, and at the end the ledger must match the store, funds
+must be conserved and reservations must match the resting orders.
+"""
+import asyncio
+import random
+from collections import defaultdict
+
+import pytest
+from fastapi import HTTPException
+
+from src.config import settings
+from src.balances.ledger import ledger, reservation
+from src.instruments.registry import registry
+from src.orders import service
+from src.orders.engine import engine, RestingOrder
+from src.orders.models import Direction
+from src.orders.schemas import LimitOrderBody, MarketOrderBody, AmendOrderBody
+from src.orders.sequencer import Sequencer
+
+
+QUOTE = "TEST-QUOTE"
+TICKERS = ["TEST-A", "TEST-B", "TEST-C"]
+USERS = [f"user-{n}" for n in range(6)]
+FIELDS = RestingOrder.__slots__
+
+
+class WriteFailed(Exception):
+    pass
+
+
+class Store:
+    # what the database would hold: committed balances and, per instrument,
+    # the resting orders as of the last job on its ticker
+    def __init__(self, rng: random.Random, failure_rate: float):
+        self.rng = rng
+        self.failure_rate = failure_rate
+        self.balances: dict[tuple[str, str], int] = defaultdict(int)
+        self.books: dict[str, list[dict]] = {}
+        self.failures = 0
+
+    async def pause(self):
+        for _ in range(self.rng.randint(0, 3)):
+            await asyncio.sleep(0)
+
+    def session(self) -> "Session":
+        return Session(self)
+
+    def snapshot(self, instrument_id: str):
+        self.books[instrument_id] = [
+            {field: getattr(o, field) for field in FIELDS}
+            for o in engine.orders.values() if o.instrument_id == instrument_id
+        ]
+
+
+class Session:
+    def __init__(self, store: Store):
+        self.store = store
+        self.deltas: dict[tuple[str, str], int] = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def connection(self):
+        await self.store.pause()
+
+    async def execute(self, stmt):
+        await self.store.pause()
+
+    async def commit(self):
+        await self.store.pause()
+        if self.store.rng.random() < self.store.failure_rate:
+            self.store.failures += 1
+            raise WriteFailed
+        for key, delta in self.deltas.items():
+            self.store.balances[key] += delta
+
+
+@pytest.fixture
+def store(monkeypatch):
+    rng = random.Random()
+    store = Store(rng, 0.2)
+
+    async def persist_fills(session, instrument_id, fills, timestamp):
+        await store.pause()
+        return list(range(len(fills)))
+
+    async def update_candles(session, instrument_id, fills, timestamp):
+        await store.pause()
+
+    async def apply_deltas(session, deltas):
+        await store.pause()
+        session.deltas = dict(deltas)
+
+    async def load_books(instrument_id=None):
+        engine.reset(instrument_id)
+        for fields in store.books.get(instrument_id, []):
+            engine.book(instrument_id, registry.get_ticker(instrument_id))
+            engine.rest(RestingOrder(**fields))
+        engine.stale.discard(instrument_id)
+
+    monkeypatch.setattr(service, "session_factory", store.session)
+    monkeypatch.setattr(service, "persist_fills", persist_fills)
+    monkeypatch.setattr(service, "update_candles", update_candles)
+    monkeypatch.setattr(service, "apply_deltas", apply_deltas)
+    monkeypatch.setattr(service, "load_books", load_books)
+    monkeypatch.setattr(settings, "QUOTE_TICKER", QUOTE)
+    engine.reset()
+    ledger.clear()
+    registry.clear()
+    for ticker in [QUOTE] + TICKERS:
+        registry.add(f"id-{ticker}", ticker, ticker)
+    yield store
+    engine.reset()
+    ledger.clear()
+    registry.clear()
+
+
+def random_limit(rng: random.Random, ticker: str) -> LimitOrderBody:
+    direction = rng.choice([Direction.BUY, Direction.SELL])
+    return LimitOrderBody(direction=direction, ticker=ticker, qty=rng.randint(1, 20), price=rng.randint(90, 110))
+
+
+async def step(rng: random.Random, store: Store, sequencer: Sequencer):
+    user_id = rng.choice(USERS)
+    ticker = rng.choice(TICKERS)
+    instrument_id = registry.get_id(ticker)
+    roll = rng.random()
+    if roll < 0.45:
+        job = service.create_order, user_id, random_limit(rng, ticker)
+    elif roll < 0.6:
+        direction = rng.choice([Direction.BUY, Direction.SELL])
+        job = service.create_order, user_id, MarketOrderBody(direction=direction, ticker=ticker, qty=rng.randint(1, 30))
+    elif roll < 0.7:
+        job = service.create_orders, user_id, ticker, [random_limit(rng, ticker) for _ in range(rng.randint(1, 8))]
+    elif roll < 0.75:
+        job = service.cancel_orders, user_id, ticker, rng.choice([None, Direction.BUY, Direction.SELL])
+    else:
+        resting = [o for o in engine.users.get(user_id, {}).values() if o.instrument_id == instrument_id]
+        if not resting:
+            return
+        order = rng.choice(resting)
+        if rng.random() < 0.5:
+            job = service.cancel_order, user_id, order.id
+        else:
+            amend = AmendOrderBody(
+                qty=rng.choice([None, order.filled + rng.randint(1, 20)]),
+                price=rng.choice([None, rng.randint(90, 110)])
+            )
+            job = service.amend_order, user_id, order.id, amend
+
+    async def run(fn, *args):
+        # the book left after a job is what the store holds for the instrument:
+        # either the job committed, or its book was reloaded from the store
+        try:
+            await fn(*args)
+        finally:
+            store.snapshot(instrument_id)
+
+    try:
+        await sequencer.submit(ticker, run, *job)
+    except (HTTPException, WriteFailed):
+        pass
+
+
+def check_step(store: Store):
+    assert min(ledger.amounts.values(), default=0) >= 0
+    assert min(store.balances.values(), default=0) >= 0
+
+
+def check_end(store: Store, deposited: dict[str, int]):
+    assert {k: v for k, v in ledger.amounts.items() if v} == {k: v for k, v in store.balances.items() if v}
+    totals = defaultdict(int)
+    for (_, instrument_id), amount in store.balances.items():
+        totals[instrument_id] += amount
+    assert dict(totals) == deposited
+    derived = defaultdict(int)
+    for order in engine.orders.values():
+        key, qty = reservation(order, registry.get_id(QUOTE))
+        derived[key] += qty
+    assert {k: v for k, v in ledger.reserved.items() if v} == {k: v for k, v in derived.items() if v}
+    for key, qty in ledger.reserved.items():
+        assert qty <= ledger.amounts.get(key, 0)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_ledger_invariants(store: Store, seed: int):
+    rng = random.Random(seed)
+    store.rng.seed(seed)
+    deposited = defaultdict(int)
+    for user_id in USERS:
+        for ticker in [QUOTE] + TICKERS:
+            instrument_id = registry.get_id(ticker)
+            amount = rng.randint(0, 2_000) if ticker == QUOTE else rng.randint(0, 30)
+            ledger.amounts[user_id, instrument_id] += amount
+            store.balances[user_id, instrument_id] += amount
+            deposited[instrument_id] += amount
+
+    async def main():
+        sequencer = Sequencer()
+        try:
+            for _ in range(100):
+                await asyncio.gather(*(step(rng, store, sequencer) for _ in range(8)))
+                check_step(store)
+        finally:
+            await sequencer.stop()
+
+    asyncio.run(main())
+    assert store.failures
+    check_end(store, dict(deposited))